@@ -0,0 +1,131 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    # For when running as part of the package
+    from .console import console
+    from .cli import Cli
+except ImportError:
+    # For when running directly
+    from console import console
+    from cli import Cli
+
+
+def load_manifest(path) -> list:
+    """
+    Read a JSON or TOML manifest listing the projects to create.
+
+    JSON:
+        {"projects": [{"name": "shop", "apps": ["orders", "carts"], "directory": "services"}]}
+    TOML:
+        [[projects]]
+        name = "shop"
+        apps = ["orders", "carts"]
+        directory = "services"
+
+    `app = "orders"` works too for a single app.
+    `directory` is optional and relative to the manifest's folder,
+    it defaults to the current directory.
+
+    returns: a list of dicts with "name", "apps" and "directory" keys.
+    """
+    if str(path).endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            # python < 3.11
+            import tomli as tomllib
+
+        with open(path, "rb") as file:
+            data = tomllib.load(file)
+    else:
+        with open(path, "r") as file:
+            data = json.load(file)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for project in data.get("projects", []):
+        apps = project.get("apps", project.get("app"))
+        if isinstance(apps, str):
+            apps = [apps]
+        if "name" not in project or not apps:
+            raise ValueError(f"Manifest entry {project!r} needs a 'name' and 'apps'")
+
+        directory = os.path.join(base_dir, project.get("directory", ""))
+        entries.append(
+            {
+                "name": project["name"],
+                "apps": list(apps),
+                "directory": os.path.normpath(directory),
+            }
+        )
+    return entries
+
+
+def _run_entry(entry, options) -> tuple:
+    """
+    Create one project from a manifest entry, runs inside a worker process.
+    returns: (success, seconds)
+    """
+    console.quiet = True
+    start = time.perf_counter()
+    if options.get("trace"):
+        # a trace per project, <trace>-<project>.json
+        root, extension = os.path.splitext(options["trace"])
+        options = dict(options, trace=f"{root}-{entry['name']}{extension}")
+    try:
+        os.makedirs(entry["directory"], exist_ok=True)
+        success = Cli(
+            entry["name"], entry["apps"], directory=entry["directory"], **options
+        ).run_setup()
+    except Exception as e:
+        success = False
+    return success, time.perf_counter() - start
+
+
+def run_batch(entries, workers=None, **options) -> bool:
+    """
+    Create every project in `entries` across a pool of processes and print a summary.
+    `options` are passed to every `Cli`.
+    returns: True if every project was created, False otherwise.
+    """
+    from rich.table import Table
+
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_run_entry, entry, options): index
+            for index, entry in enumerate(entries)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                results[index] = (False, 0.0)
+
+    table = Table(title=f"Created {len(entries)} project(s) with {workers} worker(s)")
+    table.add_column("Project")
+    table.add_column("Apps")
+    table.add_column("Directory")
+    table.add_column("Status")
+    table.add_column("Time", justify="right")
+
+    for index, entry in enumerate(entries):
+        success, seconds = results[index]
+        table.add_row(
+            entry["name"],
+            ", ".join(entry["apps"]),
+            entry["directory"],
+            "✅" if success else "❌",
+            f"{seconds:.2f}s",
+        )
+
+    console.print(table)
+    console.print(f"Total: {time.perf_counter() - start:.2f}s", style="bold")
+    return all(success for success, seconds in results.values())
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+
+try:
+    # For when running as part of the package
+    from .cache import cache_dir
+    from . import tracing
+except ImportError:
+    # For when running directly
+    from cache import cache_dir
+    import tracing
+
+
+# name of the virtualenv folder inside the project, already in the generated .gitignore
+VENV_NAME = "env"
+
+# packages of the venv itself, left out of requirements.txt
+VENV_PACKAGES = {"pip", "setuptools", "wheel", "distribute"}
+
+
+def wheelhouse_dir(wheelhouse=None):
+    """
+    The local wheelhouse to install from, `wheelhouse` or $DJANG_SETUP_WHEELHOUSE.
+    returns: the folder, or None to install from the package index.
+    """
+    return wheelhouse or os.environ.get("DJANG_SETUP_WHEELHOUSE") or None
+
+
+def pip_install_args(wheelhouse=None) -> list:
+    """
+    Extra `pip install` arguments that restrict pip to the wheelhouse, if there is one.
+    """
+    wheelhouse = wheelhouse_dir(wheelhouse)
+    if wheelhouse is None:
+        return []
+    return ["--no-index", "--find-links", os.path.abspath(wheelhouse)]
+
+
+def default_requirements() -> list:
+    """
+    Django and django-environ, pinned to the versions installed next to djang-setup
+    since those are the ones the generated project was rendered with.
+    """
+    from importlib import metadata
+
+    requirements = []
+    for name in ("django", "django-environ"):
+        try:
+            requirements.append(f"{name}=={metadata.version(name)}")
+        except metadata.PackageNotFoundError:
+            requirements.append(name)
+    return requirements
+
+
+def _site_packages(env_dir) -> str:
+    if os.name == "nt":
+        return os.path.join(env_dir, "Lib", "site-packages")
+    return os.path.join(
+        env_dir,
+        "lib",
+        f"python{sys.version_info[0]}.{sys.version_info[1]}",
+        "site-packages",
+    )
+
+
+def _bin_dir(env_dir) -> str:
+    return os.path.join(env_dir, "Scripts" if os.name == "nt" else "bin")
+
+
+def _python(env_dir) -> str:
+    return os.path.join(_bin_dir(env_dir), "python.exe" if os.name == "nt" else "python")
+
+
+def _create_venv(env_dir, with_pip=False):
+    import venv
+
+    venv.EnvBuilder(with_pip=with_pip, symlinks=os.name != "nt").create(env_dir)
+
+
+def _link_tree(source, target):
+    """
+    Hardlink every file of `source` into `target`, copying when hardlinks
+    are not possible (another filesystem, Windows shares...).
+    """
+    for root, dirs, files in os.walk(source):
+        target_dir = os.path.join(target, os.path.relpath(root, source))
+        os.makedirs(target_dir, exist_ok=True)
+        for filename in files:
+            target_file = os.path.join(target_dir, filename)
+            if os.path.exists(target_file):
+                continue
+            try:
+                os.link(os.path.join(root, filename), target_file)
+            except OSError:
+                shutil.copy2(os.path.join(root, filename), target_file)
+
+
+def _env_key(requirements, wheelhouse) -> str:
+    key_data = {
+        "python": sys.version,
+        "platform": sys.platform,
+        "requirements": sorted(requirements),
+        "wheelhouse": os.path.abspath(wheelhouse) if wheelhouse else None,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _build_shared_env(requirements, wheelhouse) -> str:
+    """
+    Install `requirements` once into a cached environment shared by every project.
+    returns: the cached environment folder, holding `site-packages`, `bin` and `scripts.json`.
+    """
+    root = cache_dir("venvs")
+    shared = os.path.join(root, _env_key(requirements, wheelhouse))
+    if os.path.isdir(shared):
+        return shared
+
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".tmp-", dir=root)
+    try:
+        env_dir = os.path.join(staging, "env")
+        _create_venv(env_dir, with_pip=True)
+        venv_scripts = set(os.listdir(_bin_dir(env_dir)))
+        tracing.run(
+            [
+                _python(env_dir),
+                "-m",
+                "pip",
+                "install",
+                "--disable-pip-version-check",
+                "--quiet",
+                *pip_install_args(wheelhouse),
+                *requirements,
+            ],
+            check=True,
+        )
+
+        os.rename(_site_packages(env_dir), os.path.join(staging, "site-packages"))
+
+        # console scripts installed by the requirements (django-admin...),
+        # their shebang points to the staging venv and is rewritten per project
+        os.makedirs(os.path.join(staging, "bin"))
+        scripts = {"python": _python(env_dir), "names": []}
+        if os.name != "nt":
+            for name in sorted(os.listdir(_bin_dir(env_dir))):
+                if name in venv_scripts and not name.startswith("pip"):
+                    continue
+                os.rename(
+                    os.path.join(_bin_dir(env_dir), name),
+                    os.path.join(staging, "bin", name),
+                )
+                scripts["names"].append(name)
+        with open(os.path.join(staging, "scripts.json"), "w") as file:
+            json.dump(scripts, file, indent=2)
+
+        shutil.rmtree(env_dir)
+        try:
+            os.rename(staging, shared)
+        except OSError:
+            # another process built the same environment first
+            pass
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return shared
+
+
+def create_venv(project_root, requirements=None, wheelhouse=None) -> list:
+    """
+    Create `project_root/env` with `requirements` installed, reusing the
+    shared install cache (hardlinked) so only the first project runs pip.
+    returns: the resolved `name==version` pins of the installed packages.
+    """
+    from importlib import metadata
+
+    requirements = requirements or default_requirements()
+    wheelhouse = wheelhouse_dir(wheelhouse)
+    shared = _build_shared_env(requirements, wheelhouse)
+
+    env_dir = os.path.join(project_root, VENV_NAME)
+    _create_venv(env_dir)
+    _link_tree(os.path.join(shared, "site-packages"), _site_packages(env_dir))
+
+    with open(os.path.join(shared, "scripts.json"), "r") as file:
+        scripts = json.load(file)
+    for name in scripts["names"]:
+        with open(os.path.join(shared, "bin", name), "r") as file:
+            content = file.read()
+        target = os.path.join(_bin_dir(env_dir), name)
+        with open(target, "w") as file:
+            file.write(content.replace(scripts["python"], _python(env_dir), 1))
+        shutil.copymode(os.path.join(shared, "bin", name), target)
+
+    pins = []
+    for dist in metadata.distributions(path=[_site_packages(env_dir)]):
+        name = dist.metadata["Name"]
+        if name.lower() not in VENV_PACKAGES:
+            pins.append(f"{name}=={dist.version}")
+    return sorted(set(pins), key=str.lower)
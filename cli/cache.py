@@ -0,0 +1,292 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import secrets
+import tempfile
+
+try:
+    # For when running as part of the package
+    from . import __version__
+    from .tracing import span
+except ImportError:
+    # For when running directly
+    from __init__ import __version__
+    from tracing import span
+
+
+# names the cached skeletons are generated with, swapped for the real ones on a hit
+PROJECT_PLACEHOLDER = "zzprojzz"
+APP_PLACEHOLDER = "zzapp{}zz"
+SECRET_KEY_PLACEHOLDER = "zzsecretkeyzz"
+
+# same alphabet django's get_random_secret_key() uses
+SECRET_KEY_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789!@#$%^&*(-_=+)"
+# Django's template quotes it with ', only Black turns it into "
+SECRET_KEY_RE = re.compile(rb"""^(SECRET_KEY = (["']))(.*?)(\2)""", re.MULTILINE)
+
+# black's default line length, substituted lines longer than this need reformatting
+LINE_LENGTH = 88
+
+
+def cache_dir(name="skeletons") -> str:
+    """
+    Folder holding the `name` cache (skeletons, venvs),
+    under $DJANG_SETUP_CACHE_DIR or the user cache directory.
+    """
+    if os.environ.get("DJANG_SETUP_CACHE_DIR"):
+        return os.path.join(os.environ["DJANG_SETUP_CACHE_DIR"], name)
+
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, "djang-setup", name)
+
+
+def package_version(name) -> str:
+    from importlib import metadata
+
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "none"
+
+
+def skeleton_key(options) -> tuple:
+    """
+    Build the cache key of a skeleton from everything that changes its content.
+    returns: (hex digest, dict of the hashed values)
+    """
+    key_data = {
+        "djang-setup": __version__,
+        "django": package_version("django"),
+        "black": package_version("black"),
+        "options": options,
+    }
+    digest = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+    return digest[:32], key_data
+
+
+def app_placeholders(count) -> list:
+    """
+    returns: the placeholder names of `count` apps.
+    """
+    return [APP_PLACEHOLDER.format(index) for index in range(count)]
+
+
+def _camel_case(name) -> str:
+    """Same camel casing django uses for the app config class name."""
+    return "".join(x for x in name.title() if x != "_")
+
+
+def _random_secret_key() -> str:
+    return "django-insecure-" + "".join(
+        secrets.choice(SECRET_KEY_CHARS) for i in range(50)
+    )
+
+
+class SkeletonCache:
+    """
+    On-disk cache of fully generated project skeletons, evicted least recently used first.
+
+    Each entry is a folder named after its key, holding a `meta.json`
+    and a `skeleton` folder generated with the placeholder names.
+    """
+
+    def __init__(self, root=None, max_entries=32):
+        self.root = root or cache_dir()
+        self.max_entries = max_entries
+
+    def _meta_path(self, key) -> str:
+        return os.path.join(self.root, key, "meta.json")
+
+    def get(self, key):
+        """
+        Look up a skeleton and mark it as recently used.
+        returns: the skeleton folder, or None on a miss.
+        """
+        skeleton = os.path.join(self.root, key, "skeleton")
+        if not os.path.isdir(skeleton):
+            return None
+
+        try:
+            with open(self._meta_path(key), "r") as file:
+                meta = json.load(file)
+            meta["last_used"] = time.time()
+            meta["hits"] = meta.get("hits", 0) + 1
+            with open(self._meta_path(key), "w") as file:
+                json.dump(meta, file, indent=2)
+        except (OSError, ValueError) as e:
+            return None
+        return skeleton
+
+    def store(self, key, key_data, project_root) -> str:
+        """
+        Copy a project generated with the placeholder names into the cache.
+        returns: the cached skeleton folder.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            shutil.copytree(project_root, os.path.join(staging, "skeleton"))
+
+            base_settings = os.path.join(
+                staging, "skeleton", PROJECT_PLACEHOLDER, "settings", "base.py"
+            )
+            with open(base_settings, "rb") as file:
+                content = file.read()
+            content, replaced = SECRET_KEY_RE.subn(
+                lambda m: m.group(1) + SECRET_KEY_PLACEHOLDER.encode() + m.group(4),
+                content,
+            )
+            if not replaced:
+                # every project copied from it would share this project's key
+                raise ValueError(f"No SECRET_KEY to replace in {base_settings}, not caching it")
+            with open(base_settings, "wb") as file:
+                file.write(content)
+
+            now = time.time()
+            with open(os.path.join(staging, "meta.json"), "w") as file:
+                json.dump(
+                    {"key": key_data, "created": now, "last_used": now, "hits": 0},
+                    file,
+                    indent=2,
+                )
+
+            try:
+                os.rename(staging, os.path.join(self.root, key))
+            except OSError:
+                # another process stored the same skeleton first
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.evict()
+        return os.path.join(self.root, key, "skeleton")
+
+    def entries(self) -> list:
+        """
+        returns: the cached entries as dicts, most recently used first.
+        """
+        if not os.path.isdir(self.root):
+            return []
+
+        entries = []
+        for key in os.listdir(self.root):
+            if key.startswith("."):
+                # skeleton still being stored
+                continue
+            try:
+                with open(self._meta_path(key), "r") as file:
+                    meta = json.load(file)
+            except (OSError, ValueError) as e:
+                continue
+            meta["digest"] = key
+            meta["size"] = sum(
+                os.path.getsize(os.path.join(root, filename))
+                for root, dirs, files in os.walk(os.path.join(self.root, key))
+                for filename in files
+            )
+            entries.append(meta)
+
+        entries.sort(key=lambda meta: meta["last_used"], reverse=True)
+        return entries
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used entries above `max_entries`.
+        returns: the number of removed entries.
+        """
+        stale = self.entries()[self.max_entries:]
+        for meta in stale:
+            shutil.rmtree(os.path.join(self.root, meta["digest"]), ignore_errors=True)
+        return len(stale)
+
+    def clear(self) -> int:
+        """
+        Remove every cached entry.
+        returns: the number of removed entries.
+        """
+        entries = self.entries()
+        for meta in entries:
+            shutil.rmtree(os.path.join(self.root, meta["digest"]), ignore_errors=True)
+        return len(entries)
+
+
+def _substitute(content, replacements) -> bytes:
+    for placeholder, value in replacements:
+        content = content.replace(placeholder, value)
+    return content
+
+
+def instantiate(skeleton, project_root, project_name, app_names):
+    """
+    Copy a cached skeleton to `project_root`, swapping the placeholders
+    for the real project/app names and generating a new SECRET_KEY.
+
+    Substituted lines that get too long are reformatted with black,
+    the result is black-stable but not always laid out exactly like a fresh run
+    (brackets exploded at placeholder length stay exploded).
+    """
+    placeholders = app_placeholders(len(app_names))
+    replacements = [
+        (PROJECT_PLACEHOLDER.encode(), project_name.encode()),
+        (SECRET_KEY_PLACEHOLDER.encode(), _random_secret_key().encode()),
+    ]
+    for placeholder, app_name in zip(placeholders, app_names):
+        replacements.append((placeholder.encode(), app_name.encode()))
+        replacements.append(
+            (_camel_case(placeholder).encode(), _camel_case(app_name).encode())
+        )
+    path_replacements = [(PROJECT_PLACEHOLDER, project_name)] + list(
+        zip(placeholders, app_names)
+    )
+    # files whose substituted lines got too long for black's layout
+    to_format = []
+
+    for root, dirs, files in os.walk(skeleton):
+        relative_dir = os.path.relpath(root, skeleton)
+        for placeholder, name in path_replacements:
+            relative_dir = relative_dir.replace(placeholder, name)
+        target_dir = os.path.normpath(os.path.join(project_root, relative_dir))
+        os.makedirs(target_dir, exist_ok=True)
+
+        for filename in files:
+            source = os.path.join(root, filename)
+            target_name = filename
+            for placeholder, name in path_replacements:
+                target_name = target_name.replace(placeholder, name)
+            target = os.path.join(target_dir, target_name)
+
+            with open(source, "rb") as file:
+                content = file.read()
+            substituted = _substitute(content, replacements)
+
+            if substituted == content:
+                shutil.copy2(source, target)
+                continue
+
+            with open(target, "wb") as file:
+                file.write(substituted)
+            shutil.copymode(source, target)
+
+            if filename.endswith(".py") and any(
+                len(_substitute(line, replacements)) > LINE_LENGTH
+                for line in content.splitlines()
+                if any(placeholder in line for placeholder, value in replacements)
+            ):
+                to_format.append(target)
+
+    if to_format:
+        import black
+
+        mode = black.Mode()
+        with span("black", "format", paths=to_format):
+            for path in to_format:
+                with open(path, "r") as file:
+                    source = file.read()
+                with open(path, "w") as file:
+                    file.write(black.format_str(source, mode=mode))
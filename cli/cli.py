@@ -1,22 +1,154 @@
 import os
-import sys
-import subprocess
-import astor
 import ast
+import shutil
+import functools
+import tempfile
 
 try:
     # For when running as part of the package
-    from .console import console
+    from .console import console, quiet
+    from .scaffold import start_project, start_apps
+    from .pipeline import FileBuffer
+    from .cache import (
+        SkeletonCache,
+        skeleton_key,
+        instantiate,
+        PROJECT_PLACEHOLDER,
+        app_placeholders,
+        package_version,
+        SECRET_KEY_RE,
+    )
+    from .bootstrap import create_venv, default_requirements, VENV_NAME
+    from .lock import GenerationLock, LOCK_FILE, snapshot, file_hash
+    from .staging import staging_dir, publish
+    from .scheduler import Step, Scheduler
+    from .tracing import Tracer, span, record_error
+    from .project import ProjectIndex, ModuleIndex, add_installed_apps, add_url_includes
+    from .profiles import production_settings, env_prod
+    from .servers import gunicorn_config, server_env, server_requirements
+    from . import harness
+    from . import containers
+    from . import __version__
 except ImportError:
     # For when running directly
-    from console import console
+    from console import console, quiet
+    from scaffold import start_project, start_apps
+    from pipeline import FileBuffer
+    from cache import (
+        SkeletonCache,
+        skeleton_key,
+        instantiate,
+        PROJECT_PLACEHOLDER,
+        app_placeholders,
+        package_version,
+        SECRET_KEY_RE,
+    )
+    from bootstrap import create_venv, default_requirements, VENV_NAME
+    from lock import GenerationLock, LOCK_FILE, snapshot, file_hash
+    from staging import staging_dir, publish
+    from scheduler import Step, Scheduler
+    from tracing import Tracer, span, record_error
+    from project import ProjectIndex, ModuleIndex, add_installed_apps, add_url_includes
+    from profiles import production_settings, env_prod
+    from servers import gunicorn_config, server_env, server_requirements
+    import harness
+    import containers
+    from __init__ import __version__
+
+
+# the options each built-in step reads, changing any other one doesn't redo it
+STEP_INPUTS = {
+    "_create_project": (),
+    "_create_app": ("apps",),
+    "_create_settings": (),
+    "_update_base_setting": ("apps",),
+    "_update_dev_setting": ("apps", "bench"),
+    "_update_prod_setting": ("profile", "docker"),
+    "_create_project_util_files": ("profile", "server", "docker"),
+    "_create_app_urls_file": ("apps", "bench"),
+    "_add_app_urls_to_project_urls": ("apps",),
+    "_update_settings_path": (),
+    # writes the files the steps above patch
+    "_write_files": ("apps",),
+    "_create_server_config": ("server",),
+    "_create_bench_files": ("apps",),
+    "_create_container_files": ("server", "docker"),
+}
 
 
 class Cli:
-    def __init__(self, project_name, app_name):
+    def __init__(
+        self,
+        project_name,
+        app_names,
+        use_subprocess=False,
+        use_cache=False,
+        directory=None,
+        bootstrap_venv=False,
+        wheelhouse=None,
+        requirements=None,
+        force=False,
+        timings=False,
+        profile=None,
+        server=None,
+        bench=False,
+        trace=None,
+        settings=None,
+        docker=False,
+    ):
+        """
+        app_names: name of the app to create, or a list of app names.
+        use_subprocess: run `django-admin startproject` and `manage.py startapp`
+        as subprocesses instead of rendering the templates in-process.
+        use_cache: copy the project from the skeleton cache, generating and caching it on a miss.
+        directory: folder the project is created in, defaults to the current directory.
+        Nothing changes the working directory, several Cli can run at once in threads.
+        bootstrap_venv: create a virtualenv in the project with the requirements installed.
+        wheelhouse: local folder of wheels the virtualenv is installed from (no network).
+        requirements: packages to install, defaults to the pinned django and django-environ.
+        force: when updating an existing project, overwrite the files edited since they were generated.
+        timings: print how long each step took and the critical path.
+        profile: extra production settings, "performance" for persistent database connections,
+        cached templates, a cache backend and sessions, hashed static files and console logging.
+        server: write a gunicorn.conf.py sized to the CPU count, with "sync", "gthread" or "uvicorn" workers.
+        bench: add a health view, a `bench_<app>` command and a development timing middleware to every app.
+        trace: file to write a Chrome trace (open it in Perfetto) of the steps, subprocesses
+        and file reads/writes to, with their durations, exit codes and errors.
+        settings: dotted settings module of the existing project `add_apps` adds to,
+        found from manage.py when None.
+        docker: add a multi-stage Dockerfile and a .dockerignore, requirements.txt lists what the image installs.
+        """
         self.django_project_name = project_name
-        self.django_app_name = app_name
-        self.project_root = os.path.join(os.getcwd(), self.django_project_name)
+        if isinstance(app_names, str):
+            app_names = [app_names]
+        self.django_app_names = list(app_names)
+        self.use_subprocess = use_subprocess
+        self.use_cache = use_cache
+        self.bootstrap_venv = bootstrap_venv
+        self.wheelhouse = wheelhouse
+        self.requirements = requirements
+        self.force = force
+        self.timings = timings
+        self.profile = profile
+        self.server = server
+        self.bench = bench
+        self.trace = trace
+        self.settings = settings
+        self.docker = docker
+        self._set_paths(directory or os.getcwd())
+
+        # python files edited by the steps, written once by _write_files
+        self.files = FileBuffer()
+        self._written_files = []
+
+        # steps added with add_step and by plugins
+        self.custom_steps = []
+        self.scheduler = None
+        self._load_plugins()
+
+    def _set_paths(self, directory):
+        """Point every path of the project inside `directory`."""
+        self.project_root = os.path.join(os.path.abspath(directory), self.django_project_name)
         self.project_configs = os.path.join(self.project_root, self.django_project_name)
         self.settings_folder = os.path.join(self.project_configs, "settings")
         self.settings_file = os.path.join(self.project_configs, "settings.py")
@@ -30,17 +162,10 @@ class Cli:
         # check if a project already exists
         if not os.path.exists(self.project_root):
             try:
-                import django
-            except ImportError:
-                subprocess.run(
-                    [sys.executable, "-m", "pip", "install", "--upgrade", "django"],
-                    check=True,
-                )
-                
-            try:
-                subprocess.run(
-                    ["django-admin", "startproject", self.django_project_name],
-                    check=True,
+                start_project(
+                    self.django_project_name,
+                    self.project_root,
+                    use_subprocess=self.use_subprocess,
                 )
                 console.print(
                     f"\nDjango project '{self.django_project_name}' created successfully! ✅",
@@ -48,6 +173,7 @@ class Cli:
                 )
                 return True
             except Exception as e:
+                record_error(e)
                 return False
             
         else:
@@ -55,24 +181,21 @@ class Cli:
             return False
 
     def _create_app(self) -> bool:
-        """Create a new Django app, return True if successful, False otherwise."""
+        """Create the Django apps concurrently, return True if successful, False otherwise."""
         try:
-            os.chdir(self.project_root)
-            subprocess.run(
-                [
-                    sys.executable,
-                    os.path.join(self.project_root, "manage.py"),
-                    "startapp",
-                    self.django_app_name,
-                ],
-                check=True,
-            )
-            console.print(
-                f"\nDjango app '{self.django_app_name}' created successfully! ✅",
-                style="bold on blue",
+            start_apps(
+                self.django_app_names,
+                self.project_root,
+                use_subprocess=self.use_subprocess,
             )
+            for app_name in self.django_app_names:
+                console.print(
+                    f"\nDjango app '{app_name}' created successfully! ✅",
+                    style="bold on blue",
+                )
             return True
         except Exception as e:
+            record_error(e)
             # print("An error occurred while creating the Django app." + str(e)) # for debugging
             return False
 
@@ -87,9 +210,11 @@ class Cli:
 
         returns: True if successful, False otherwise.
         """
-        os.chdir(self.project_root)
+        def path(name):
+            return os.path.join(self.project_root, name)
+
         try:
-            with open(".gitignore", "w") as file:
+            with open(path(".gitignore"), "w") as file:
                 file.write("*.pyc\n")
                 file.write("__pycache__/\n")
                 file.write("*.sqlite3\n")
@@ -101,13 +226,22 @@ class Cli:
                 file.write(".idea\n")
                 file.write("*.DS_Store\n")
 
-            open("requirements.txt", "a").close()
-            open("README.md", "a").close()
-            open(".env.dev", "a").close()
-            with open(".env.prod", "w") as file:
+            if self.docker:
+                # installed by the image
+                with open(path("requirements.txt"), "w") as file:
+                    file.write("".join(f"{requirement}\n" for requirement in self._requirements()))
+            else:
+                open(path("requirements.txt"), "a").close()
+            open(path("README.md"), "a").close()
+            open(path(".env.dev"), "a").close()
+            with open(path(".env.prod"), "w") as file:
                 file.write("DEBUG=False\n")
-                file.write("ALLOWED_HOSTS='*' # Add your domains in production separated by commas\n")
-                file.write("SECRET_KEY='' # generate and add new secret key using Django shell\n")
+                file.write("# Add your domains in production separated by commas\n")
+                file.write("ALLOWED_HOSTS=*\n")
+                file.write("# generate and add new secret key using Django shell\n")
+                file.write("SECRET_KEY=\n")
+                file.write(env_prod(self.profile))
+                file.write(server_env(self.server))
 
             console.print(
                 "\nCreated requirements.txt, Readme, and .env files successfully! ✅",
@@ -115,6 +249,7 @@ class Cli:
             )
             return True
         except FileExistsError as e:
+            record_error(e)
             # print(f"An error occurred while creating the project utility files. {e}") # for debugging
             return False
 
@@ -128,22 +263,15 @@ class Cli:
         returns: True if successful, False otherwise.
         """
 
-        # cd into project folder
-        os.chdir(self.project_configs)
-
         # create folder called settings
-        os.makedirs("settings", exist_ok=True)
-
-        # move into new folder
-        os.chdir(self.settings_folder)
+        os.makedirs(self.settings_folder, exist_ok=True)
 
         # move settings.py into new settings folder and rename it to base.py
         os.rename(self.settings_file, os.path.join(self.settings_folder, "base.py"))
 
         try:
-            open("__init__.py", "a").close()
-            open("development.py", "a").close()
-            open("production.py", "a").close()
+            for name in ("__init__.py", "development.py", "production.py"):
+                open(os.path.join(self.settings_folder, name), "a").close()
 
             console.print(
                 f"\nDjango project '{self.django_project_name}' Settings folder and files created successfully! ✅",
@@ -151,6 +279,7 @@ class Cli:
             )
             return True
         except FileExistsError as e:
+            record_error(e)
             # print(F"An error occurred while creating the settings folder. {e}") # for debugging
             return False
 
@@ -160,97 +289,40 @@ class Cli:
         returns: True if successful, False otherwise.
         """
         try:
-            new_code = """
+            new_code = """import os
+import environ
+
 env = environ.Env()
-ENVIRONMENT = os.getenv('SETTING_FILE_PATH')
+ENVIRONMENT = os.getenv("SETTING_FILE_PATH")
 
 # Load environment-specific .env file
-if ENVIRONMENT == 'project.settings.production':
-    environ.Env.read_env('.env.prod')
-elif ENVIRONMENT == "project.settings.development":
-    environ.Env.read_env('.env.dev')
-            """
-            
-            # cd into project settings  folder
-            os.chdir(self.settings_folder)
-
-            # open base.py file
-            with open("base.py", "r") as file:
-                tree = ast.parse(file.read())
-                
-                # Create a new import node
-                os_import = ast.parse("import os").body[0]
-                environ_impoort = ast.parse("import environ").body[0]
-
-                # Find the last import statement
-                last_import_index = -1
-                for index, node in enumerate(tree.body):
-                    if isinstance(node, (ast.Import, ast.ImportFrom)):
-                        last_import_index = index
-
-                # Insert the new import after the last import statement
-                tree.body.insert(last_import_index + 1, os_import)
-                tree.body.insert(last_import_index + 2, environ_impoort)
-                
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.Assign):
-                        if node.targets[0].id == "INSTALLED_APPS":
-                            node.value.elts.append(ast.Constant(s=self.django_app_name))
-
-                        if node.targets[0].id == "ALLOWED_HOSTS":
-                            node.value.elts.append(ast.Constant(s="*"))
-
-                        if node.targets[0].id == "BASE_DIR":
-                            # Create the AST for Path(__file__).resolve().parent.parent.parent
-                            node.value = ast.Call(
-                                func=ast.Attribute(
-                                    value=ast.Call(
-                                        func=ast.Name(id="Path", ctx=ast.Load()),  # Path()
-                                        args=[ast.Name(id="__file__", ctx=ast.Load())],  # __file__
-                                        keywords=[],
-                                    ),
-                                    attr="resolve",  # resolve()
-                                    ctx=ast.Load(),
-                                ),
-                                args=[],
-                                keywords=[],
-                            )
-
-                            # Add `.parent.parent.parent` to the result
-                            node.value = ast.Attribute(
-                                value=ast.Attribute(
-                                    value=ast.Attribute(
-                                        value=node.value, attr="parent", ctx=ast.Load()  # first parent
-                                    ),
-                                    attr="parent",  # second parent
-                                    ctx=ast.Load(),
-                                ),
-                                attr="parent",  # third parent
-                                ctx=ast.Load(),
-                            )
-
-                new_nodes = ast.parse(new_code).body
-                for i, new_node in enumerate(new_nodes):
-                    tree.body.insert(last_import_index + 3 + i, new_node)
-
-                # Iterate over the AST nodes and add a blank line after assignments
-                for index, node in enumerate(tree.body):
-                    # Check if the node is an assignment (Store, Assignment or AugAssign)
-                    if isinstance(node, ast.Assign):
-                        # Insert a 'pass' node to simulate a blank line
-                        tree.body.insert(index + 1, "\n")
-
-            # write the changes to the file, with indentation and spaces
-            with open("base.py", "w") as file:
-                file.write(astor.to_source(tree))
-
-            # run black to format the code on base.py
-            subprocess.run(["black", "base.py"], check=True)
+if ENVIRONMENT == "{project}.settings.production":
+    environ.Env.read_env(".env.prod")
+elif ENVIRONMENT == "{project}.settings.development":
+    environ.Env.read_env(".env.dev")
+""".replace("{project}", self.django_project_name)
+
+            # load base.py into the file buffer
+            source = self.files.source(os.path.join(self.settings_folder, "base.py"))
+            settings = ModuleIndex(source)
+
+            # Insert the new code after the last import statement
+            source.insert_after(settings.imports[-1], new_code)
+
+            add_installed_apps(settings, self.django_app_names)
+            source.extend_list(settings.assignments["ALLOWED_HOSTS"].value, ['"*"'])
+            # one more parent, settings.py moved into the settings folder
+            source.replace(
+                settings.assignments["BASE_DIR"].value,
+                "Path(__file__).resolve().parent.parent.parent",
+            )
+
             console.print(
                 f"\nUpdated settings/base.py successfully! ✅", style="bold on blue"
             )
             return True
         except Exception as e:
+            record_error(e)
             return False
 
     def _update_dev_setting(self) -> bool:
@@ -259,12 +331,11 @@ elif ENVIRONMENT == "project.settings.development":
         returns: True if successful, False otherwise.
         """
         try:
-            # cd into project settings folder
-            os.chdir(self.settings_folder)
-
             # open development.py file
-            with open("development.py", "w") as file:
+            with open(os.path.join(self.settings_folder, "development.py"), "w") as file:
                 file.write("from .base import *")
+                if self.bench:
+                    file.write(harness.dev_settings(self.django_app_names))
 
             console.print(
                 f"\nUpdated settings/development.py successfully! ✅",
@@ -272,6 +343,7 @@ elif ENVIRONMENT == "project.settings.development":
             )
             return True
         except Exception as e:
+            record_error(e)
             # print(f"An error occurred while updating the development settings file. {e}") # for debugging
             return False
 
@@ -282,49 +354,58 @@ elif ENVIRONMENT == "project.settings.development":
         """
 
         try:
-            # cd into project settings folder
-            os.chdir(self.settings_folder)
-
-            # open development.py file
-            with open("production.py", "w") as file:
+            # open production.py file
+            with open(os.path.join(self.settings_folder, "production.py"), "w") as file:
                 file.write("from .base import *\n")
                 file.write("import os\n\n")
-                file.write("DEBUG = env('DEBUG')\n")
+                file.write("DEBUG = env.bool('DEBUG', default=False)\n")
                 file.write("SECRET_KEY = env('SECRET_KEY')\n")
                 file.write(
                     "ALLOWED_HOSTS = env('ALLOWED_HOSTS').split(',')\n"
                 )
-                file.write(
-                    "DATABASES = {} # Add your production database settings here\n"
-                )
+                if self.profile is None:
+                    file.write(
+                        "DATABASES = {} # Add your production database settings here\n"
+                    )
+                else:
+                    import django
+
+                    file.write(production_settings(self.profile, django.VERSION[:2]))
+                if self.docker and self.profile is None:
+                    file.write(containers.STATIC_ROOT)
 
             console.print(
                 f"\nUpdated settings/production.py successfully! ✅", style="bold on blue"
             )
             return True
         except Exception as e:
+            record_error(e)
             # print(f"An error occurred while updating the production settings file. {e}") # for debugging
             return False
 
-    def _create_app_urls_file(self) -> bool:
+    def _create_app_urls_file(self, app_names=None) -> bool:
         """
-        create a urls.py file in the app folder.
+        create a urls.py file in every app folder (of `app_names`, default all the apps).
         returns: True if successful, False otherwise.
         """
 
         try:
-            # cd into the app folder
-            os.chdir(os.path.join(self.project_root, self.django_app_name))
-
-            # create urls.py file
-            open("urls.py", "w").close()
+            for app_name in app_names or self.django_app_names:
+                # an empty urlpatterns so the include() in the project urls.py resolves
+                with open(os.path.join(self.project_root, app_name, "urls.py"), "w") as file:
+                    if self.bench:
+                        file.write(harness.APP_URLS)
+                    else:
+                        file.write("from django.urls import path\n\n")
+                        file.write("urlpatterns = []\n")
 
-            console.print(
-                f"\nCreated '{self.django_app_name}/urls.py' successfully! ✅",
-                style="bold on blue",
-            )
+                console.print(
+                    f"\nCreated '{app_name}/urls.py' successfully! ✅",
+                    style="bold on blue",
+                )
             return True
         except Exception as e:
+            record_error(e)
             return False
 
     def _add_app_urls_to_project_urls(self) -> bool:
@@ -332,127 +413,777 @@ elif ENVIRONMENT == "project.settings.development":
         Add the app urls to the project urls file.
         returns: True if successful, False otherwise.
         """
-        os.chdir(self.project_configs)
-
         try:
-            with open("urls.py", "r") as file:
-                tree = ast.parse(file.read())
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.ImportFrom):
-                        if node.module == "django.urls":
-                            # add the include function to the import statement, if it doesn't exist
-                            if not any(alias.name == "include" for alias in node.names):
-                                node.names.append(ast.alias(name="include", asname=None))
-
-                for node in ast.walk(tree):
-                    if not any(isinstance(node, ast.Assign) for node in ast.walk(tree)):
-                        if isinstance(node, ast.Assign):
-                            if node.targets[0].id == "urlpatterns":
-                                node.value.elts.append(
-                                    ast.Call(
-                                        func=ast.Attribute(
-                                            value=ast.Name(id="path", ctx=ast.Load()),
-                                            attr="include",
-                                            ctx=ast.Load(),
-                                        ),
-                                        args=[
-                                            ast.Constant(
-                                                s=f"{self.django_app_name}.urls", kind=None
-                                            )
-                                        ],
-                                        keywords=[],
-                                    )
-                                )
-
-            with open("urls.py", "w") as file:
-                file.write(astor.to_source(tree))
-
-            subprocess.run(["black", "urls.py"], check=True)
+            # path("<app>/", include("<app>.urls")) for every app, added in one edit
+            source = self.files.source(os.path.join(self.project_configs, "urls.py"))
+            add_url_includes(ModuleIndex(source), self.django_app_names)
+
             console.print(f"\nAdded app urls to project urls.py successfully! ✅", style="bold on blue")
             return True
         except Exception as e:
+            record_error(e)
             return False
     
     def _update_settings_path(self):
         """
-        Updates manage.py setting path
+        Updates the settings path of manage.py, asgi.py and wsgi.py
+        to the SETTING_FILE_PATH env var.
         return True if successful False otherwise
         """
         try:
-            os.chdir(self.project_root)
-
-            with open("manage.py", "r") as file:
-                tree = ast.parse(file.read())
-                
-                # Check if "from django.conf import settings" is already imported
-                import_already_exists = any(
-                    isinstance(node, ast.ImportFrom)
-                    and node.module == "django.conf"
-                    and any(alias.name == "settings" for alias in node.names)
-                    for node in tree.body
+            paths = [
+                os.path.join(self.project_root, "manage.py"),
+                os.path.join(self.project_configs, "asgi.py"),
+                os.path.join(self.project_configs, "wsgi.py"),
+            ]
+            for path in paths:
+                source = self.files.source(path)
+
+                # Find and update the `os.environ.setdefault` call
+                for node in ast.walk(source.tree):
+                    if (
+                        isinstance(node, ast.Call)
+                        and isinstance(node.func, ast.Attribute)
+                        and isinstance(node.func.value, ast.Attribute)
+                        and isinstance(node.func.value.value, ast.Name)
+                        and node.func.value.value.id == "os"
+                        and node.func.value.attr == "environ"
+                        and node.func.attr == "setdefault"
+                    ):
+                        # Update the second argument of the call
+                        source.replace(node.args[1], 'os.getenv("SETTING_FILE_PATH")')
+
+            console.print(
+                f"\nUpdated manage.py, asgi.py and wsgi.py successfully! ✅",
+                style="bold on blue",
+            )
+            return True
+        except Exception as e:
+            record_error(e)
+            return False
+
+    def _create_bench_files(self) -> bool:
+        """
+        Add the load-test and profiling harness to every app:
+        a health view, a `bench_<app>` management command and a timing middleware.
+        returns: True if successful, False otherwise.
+        """
+        try:
+            for app_name in self.django_app_names:
+                app_folder = os.path.join(self.project_root, app_name)
+
+                with open(os.path.join(app_folder, "views.py"), "a") as file:
+                    file.write(harness.health_view(app_name))
+
+                with open(os.path.join(app_folder, "middleware.py"), "w") as file:
+                    file.write(harness.timing_middleware(app_name))
+
+                commands_folder = os.path.join(app_folder, "management", "commands")
+                os.makedirs(commands_folder, exist_ok=True)
+                for folder in (os.path.dirname(commands_folder), commands_folder):
+                    open(os.path.join(folder, "__init__.py"), "a").close()
+                with open(os.path.join(commands_folder, f"bench_{app_name}.py"), "w") as file:
+                    file.write(harness.bench_command(app_name))
+
+                console.print(
+                    f"\nAdded the benchmark harness to '{app_name}' successfully! ✅",
+                    style="bold on blue",
                 )
+            return True
+        except Exception as e:
+            record_error(e)
+            return False
 
-                # if not import_already_exists:
-                #     env_import = ast.parse("from django.conf import settings").body[0]
-                #     last_import_index = -1
-                #     for index, node in enumerate(tree.body):
-                #         if isinstance(node, (ast.Import, ast.ImportFrom)):
-                #             last_import_index = index
+    def _create_server_config(self) -> bool:
+        """
+        Creates gunicorn.conf.py, running the project with the chosen kind of workers.
+        returns: True if successful, False otherwise.
+        """
+        try:
+            with open(os.path.join(self.project_root, "gunicorn.conf.py"), "w") as file:
+                file.write(gunicorn_config(self.django_project_name, self.server))
 
-                #     # Insert the new import after the last import statement
-                #     tree.body.insert(last_import_index + 1, env_import)
+            console.print(
+                f"\nCreated gunicorn.conf.py ({self.server} workers) successfully! ✅",
+                style="bold on blue",
+            )
+            return True
+        except Exception as e:
+            record_error(e)
+            return False
 
-                # Find and update the `os.environ.setdefault` call
-                for node in tree.body:
-                    if isinstance(node, ast.FunctionDef) and node.name == "main":
-                        for stmt in node.body:
-                            if (
-                                isinstance(stmt, ast.Expr)
-                                and isinstance(stmt.value, ast.Call)
-                                and isinstance(stmt.value.func, ast.Attribute)
-                                and isinstance(stmt.value.func.value, ast.Attribute)
-                                and isinstance(stmt.value.func.value.value, ast.Name)
-                                and stmt.value.func.value.value.id == "os"
-                                and stmt.value.func.value.attr == "environ"
-                                and stmt.value.func.attr == "setdefault"
-                            ):
-                                # Update the second argument of the call
-                                stmt.value.args[1] = ast.parse(
-                                    'os.getenv("SETTING_FILE_PATH")'
-                                ).body[0].value
-
-
-            # write the changes to the file, with indentation and spaces
-            with open("manage.py", "w") as file:
-                file.write(astor.to_source(tree))
-
-            subprocess.run(["black", "manage.py"], check=True)
-            console.print(f"\nUpdated manage.py successfully! ✅", style="bold on blue")
+    def _create_container_files(self) -> bool:
+        """
+        Creates a multi-stage Dockerfile and its .dockerignore.
+        returns: True if successful, False otherwise.
+        """
+        try:
+            with open(os.path.join(self.project_root, "Dockerfile"), "w") as file:
+                file.write(containers.dockerfile(self.django_project_name, self.server))
+            with open(os.path.join(self.project_root, ".dockerignore"), "w") as file:
+                file.write(containers.DOCKERIGNORE)
+
+            console.print(
+                "\nCreated Dockerfile and .dockerignore successfully! ✅",
+                style="bold on blue",
+            )
             return True
         except Exception as e:
+            record_error(e)
             return False
 
-    def run_setup(self):
-        """Main method that creates everything"""
+    def _write_files(self) -> bool:
+        """
+        Format all the edited python files in one black pass and write them to disk.
+        returns: True if successful, False otherwise.
+        """
+        try:
+            self._written_files = [
+                os.path.relpath(path, self.project_root).replace(os.sep, "/")
+                for path in self.files.flush()
+            ]
+            return True
+        except Exception as e:
+            record_error(e)
+            return False
+
+    def _bootstrap_venv(self) -> bool:
+        """
+        Create the project virtualenv and write the resolved versions to requirements.txt.
+        returns: True if successful, False otherwise.
+        """
+        env_dir = os.path.join(self.project_root, VENV_NAME)
+        existed = os.path.exists(env_dir)
+        try:
+            requirements = self.requirements or self._requirements()
+
+            with span("create_venv", "setup", requirements=requirements):
+                pins = create_venv(
+                    self.project_root,
+                    requirements=requirements,
+                    wheelhouse=self.wheelhouse,
+                )
+
+            with open(os.path.join(self.project_root, "requirements.txt"), "w") as file:
+                file.write("".join(f"{pin}\n" for pin in pins))
+
+            console.print(
+                f"\nCreated virtualenv '{VENV_NAME}' and requirements.txt successfully! ✅",
+                style="bold on blue",
+            )
+            return True
+        except Exception as e:
+            record_error(e)
+            if not existed:
+                # no half-built virtualenv left behind
+                shutil.rmtree(env_dir, ignore_errors=True)
+            return False
+
+    def _requirements(self) -> list:
+        """
+        returns: the pinned django and django-environ, and the application server
+        the project runs with (gunicorn in the container image).
+        """
+        server = self.server or ("sync" if self.docker else None)
+        return default_requirements() + server_requirements(server)
+
+    def _cache_options(self) -> dict:
+        """
+        Options that change the generated files, part of the skeleton cache key.
+        """
+        options = {"apps": len(self.django_app_names)}
+        if self.profile is not None:
+            options["profile"] = self.profile
+        if self.server is not None:
+            options["server"] = self.server
+        if self.bench:
+            options["bench"] = True
+        if self.docker:
+            options["docker"] = {
+                "python": containers.python_version(),
+                "requirements": self._requirements(),
+            }
+        if self.custom_steps:
+            options["steps"] = [step.name for step in self.custom_steps]
+        return options
+
+    def _step_inputs(self, step_name) -> dict:
+        """
+        Everything the output of a step depends on, recorded in the generation lock.
+        Custom steps may read anything, they depend on every option.
+        """
+        options = dict(self._cache_options(), apps=self.django_app_names)
+        names = STEP_INPUTS.get(step_name)
+        if names is not None:
+            options = {name: options.get(name) for name in names}
+        return {
+            "step": step_name,
+            "djang-setup": __version__,
+            "django": package_version("django"),
+            "project": self.django_project_name,
+            "options": options,
+        }
+
+    def _build_quietly(self, directory, project_name, app_names):
+        """
+        Run every step for `project_name` in `directory` with this Cli's options, without printing.
+        returns: the Cli that built it if successful, None otherwise.
+        """
+        builder = Cli(
+            project_name,
+            app_names,
+            use_subprocess=self.use_subprocess,
+            directory=directory,
+            profile=self.profile,
+            server=self.server,
+            bench=self.bench,
+            docker=self.docker,
+        )
+        # the custom steps of this Cli (plugins included), called with the builder
+        builder.custom_steps = [
+            Step(
+                functools.partial(step.func.func, builder),
+                requires=step.requires,
+                outputs=step.outputs,
+                name=step.name,
+            )
+            for step in self.custom_steps
+        ]
+        with quiet():
+            built = builder._run_steps()
+        return builder if built else None
+
+    def _create_from_cache(self) -> bool:
+        """
+        Create the project from a cached skeleton,
+        generating the skeleton with placeholder names first on a cache miss.
+        returns: True if successful, False otherwise.
+        """
+        if os.path.exists(self.project_root):
+            console.print(f"\nDjango project already exists. ❌", style="bold red")
+            return False
+
+        try:
+            cache = SkeletonCache()
+            key, key_data = skeleton_key(self._cache_options())
+            skeleton = cache.get(key)
+            hit = skeleton is not None
+
+            if not hit:
+                with tempfile.TemporaryDirectory() as staging, span("build_skeleton", "setup"):
+                    builder = self._build_quietly(
+                        staging,
+                        PROJECT_PLACEHOLDER,
+                        app_placeholders(len(self.django_app_names)),
+                    )
+                    if builder is None:
+                        return False
+                    skeleton = cache.store(key, key_data, builder.project_root)
+
+            with span("instantiate", "setup", skeleton=skeleton, hit=hit):
+                instantiate(
+                    skeleton,
+                    self.project_root,
+                    self.django_project_name,
+                    self.django_app_names,
+                )
+
+            # the skeleton's lock was recorded with the placeholder names
+            lock = GenerationLock.load(self.project_root)
+            if lock is not None:
+                lock.refresh(self._step_inputs)
+                lock.save()
+
+            console.print(
+                f"\nDjango project '{self.django_project_name}' created from the "
+                f"{'cached' if hit else 'newly cached'} skeleton successfully! ✅",
+                style="bold on blue",
+            )
+            return True
+        except Exception as e:
+            record_error(e)
+            return False
+
+    def _update_project(self) -> bool:
+        """
+        Bring a project generated earlier up to date, like make:
+        the steps that failed, whose inputs changed or whose outputs are missing are redone
+        by copying their outputs from a fresh build, every other step is skipped.
+        Files edited since they were generated are kept unless `force` is set.
+        returns: True if successful, False otherwise.
+        """
+        try:
+            lock = GenerationLock.load(self.project_root)
+            step_names = [step.name for step in self._steps()]
+            stale = [
+                name
+                for name in step_names
+                if not lock.is_up_to_date(name, self._step_inputs(name), strict=self.force)
+            ]
+            if not stale:
+                console.print(
+                    f"\nDjango project '{self.django_project_name}' is up to date ✅",
+                    style="bold on blue",
+                )
+                return True
+
+            with tempfile.TemporaryDirectory() as staging:
+                with span("build", "setup", stale=stale):
+                    builder = self._build_quietly(
+                        staging, self.django_project_name, self.django_app_names
+                    )
+                if builder is None:
+                    return False
+
+                # keep the project's SECRET_KEY
+                base_settings = os.path.join(
+                    self.django_project_name, "settings", "base.py"
+                )
+                if os.path.exists(os.path.join(self.project_root, base_settings)):
+                    with open(os.path.join(self.project_root, base_settings), "rb") as file:
+                        secret_key = SECRET_KEY_RE.search(file.read())
+                    with open(os.path.join(builder.project_root, base_settings), "rb") as file:
+                        content = file.read()
+                    if secret_key is not None:
+                        with open(os.path.join(builder.project_root, base_settings), "wb") as file:
+                            file.write(SECRET_KEY_RE.sub(lambda m: secret_key.group(0), content))
+
+                fresh = GenerationLock.load(builder.project_root)
+                fresh.refresh(builder._step_inputs)
+
+                updated, conflicts = [], []
+                for name in stale:
+                    record = fresh.steps[name]
+                    for path, digest in list(record["outputs"].items()):
+                        target = os.path.join(self.project_root, path)
+                        if os.path.exists(target):
+                            current = file_hash(target)
+                            if current == digest:
+                                continue
+                            recorded = lock.recorded_hash(path)
+                            if recorded == digest and not self.force:
+                                # generated the same as before, only the user changed it
+                                continue
+                            if current != recorded and not self.force:
+                                # edited since it was generated, keep the edit
+                                conflicts.append(path)
+                                if recorded is None:
+                                    del record["outputs"][path]
+                                else:
+                                    record["outputs"][path] = recorded
+                                continue
+
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        shutil.copy2(os.path.join(builder.project_root, path), target)
+                        updated.append(path)
+
+                    # the step now owns these files
+                    for other in lock.steps.values():
+                        for path in record["outputs"]:
+                            other["outputs"].pop(path, None)
+                    lock.steps[name] = record
+                lock.save()
+
+            console.print(
+                f"\nUpdated Django project '{self.django_project_name}': redid {len(stale)} step(s), "
+                f"skipped {len(step_names) - len(stale)}, rewrote {len(updated)} file(s) ✅",
+                style="bold on blue",
+            )
+            for path in conflicts:
+                console.print(
+                    f"Kept '{path}', it was edited since it was generated (use --force to overwrite) ❌",
+                    style="bold red",
+                )
+            return True
+        except Exception as e:
+            record_error(e)
+            return False
+
+    def add_step(self, func, requires=("_create_project",), outputs=None, name=None):
+        """
+        Plug in a custom step, run by the scheduler with the built-in ones.
+        func: called with the Cli building the project (this one, or the one building
+        a skeleton or an update with the same options), returns True if successful, False otherwise.
+        requires: names of the steps it runs after.
+        outputs: paths relative to the project root (files or folders) the step writes,
+        a step without outputs may write anywhere so it never runs alongside another step.
+        """
+        self.custom_steps.append(
+            Step(
+                functools.partial(func, self),
+                requires=requires,
+                outputs=None if outputs is None else (lambda: list(outputs)),
+                name=name or func.__name__,
+            )
+        )
+
+    def _load_plugins(self):
+        """
+        Let installed packages add steps through the `djang_setup.steps` entry point group,
+        each entry point is a `register(cli)` function calling `cli.add_step`.
+        """
+        from importlib import metadata
+
+        try:
+            entry_points = metadata.entry_points(group="djang_setup.steps")
+        except TypeError:
+            # python < 3.10
+            entry_points = metadata.entry_points().get("djang_setup.steps", [])
+
+        for entry_point in entry_points:
+            entry_point.load()(self)
+
+    def _steps(self) -> list:
+        """
+        returns: the setup steps with the steps they require and the files they write,
+        in an order they can run in one after the other.
+        """
+        settings = f"{self.django_project_name}/settings"
+        apps = self.django_app_names
+
         steps = [
-            (self._create_project),
-            (self._create_app),
-            (self._create_settings),
-            (self._update_base_setting),
-            (self._update_dev_setting),
-            (self._update_prod_setting),
-            (self._create_project_util_files),
-            (self._create_app_urls_file),
-            (self._add_app_urls_to_project_urls),
-            (self._update_settings_path),
+            Step(self._create_project),
+            Step(
+                self._create_app,
+                requires=["_create_project"],
+                # `manage.py startapp` imports the project settings, which the
+                # other steps move and rewrite, so it runs on its own
+                outputs=None if self.use_subprocess else lambda: apps,
+            ),
+            Step(
+                self._create_settings,
+                requires=["_create_project"],
+                outputs=lambda: [settings],
+            ),
+            Step(
+                self._update_base_setting,
+                requires=["_create_settings"],
+                outputs=list,
+            ),
+            Step(
+                self._update_dev_setting,
+                requires=["_create_settings"],
+                outputs=lambda: [f"{settings}/development.py"],
+            ),
+            Step(
+                self._update_prod_setting,
+                requires=["_create_settings"],
+                outputs=lambda: [f"{settings}/production.py"],
+            ),
+            Step(
+                self._create_project_util_files,
+                requires=["_create_project"],
+                outputs=lambda: [".gitignore", "requirements.txt", "README.md", ".env.dev", ".env.prod"],
+            ),
+            Step(
+                self._create_app_urls_file,
+                requires=["_create_app"],
+                outputs=lambda: [f"{app_name}/urls.py" for app_name in apps],
+            ),
+            Step(
+                self._add_app_urls_to_project_urls,
+                requires=["_create_project"],
+                outputs=list,
+            ),
+            Step(
+                self._update_settings_path,
+                requires=["_create_project"],
+                outputs=list,
+            ),
+            Step(
+                self._write_files,
+                requires=[
+                    "_update_base_setting",
+                    "_add_app_urls_to_project_urls",
+                    "_update_settings_path",
+                ],
+                outputs=lambda: self._written_files,
+            ),
         ]
-        success = True
-
-        for step in steps:
-            result = step()
-            if not result:
-                success = False
-                break
-        
+
+        if self.server is not None:
+            steps.append(
+                Step(
+                    self._create_server_config,
+                    requires=["_create_project"],
+                    outputs=lambda: ["gunicorn.conf.py"],
+                )
+            )
+        if self.docker:
+            steps.append(
+                Step(
+                    self._create_container_files,
+                    requires=["_create_project"],
+                    outputs=lambda: ["Dockerfile", ".dockerignore"],
+                )
+            )
+        if self.bench:
+            steps.append(
+                Step(
+                    self._create_bench_files,
+                    requires=["_create_app"],
+                    outputs=lambda: [
+                        f"{app_name}/{name}"
+                        for app_name in apps
+                        for name in ("views.py", "middleware.py", "management")
+                    ],
+                )
+            )
+        return steps + self.custom_steps
+
+    def _run_steps(self) -> bool:
+        """
+        Run the setup steps with the scheduler, independent steps run concurrently,
+        stop at the first failure and record the steps in the generation lock.
+        returns: True if successful, False otherwise.
+        """
+        lock = GenerationLock(self.project_root)
+        self.scheduler = Scheduler(self._steps())
+
+        def on_done(step, result):
+            if step.name == "_create_project" and not result:
+                # nothing was created, don't claim the folder
+                return
+
+            if step.exclusive:
+                # it ran alone, every file no step produced yet or changed since is its own
+                produced = {
+                    path: digest
+                    for path, digest in snapshot(self.project_root).items()
+                    if lock.recorded_hash(path) != digest
+                }
+            else:
+                # other steps may still be writing, only look at its own outputs
+                produced = {}
+                for output in step.outputs():
+                    path = os.path.join(self.project_root, output)
+                    if os.path.isdir(path):
+                        produced.update(
+                            (f"{output}/{relative}", digest)
+                            for relative, digest in snapshot(path).items()
+                        )
+                    elif os.path.isfile(path):
+                        produced[output] = file_hash(path)
+
+            lock.record(
+                step.name,
+                self._step_inputs(step.name),
+                "done" if result else "failed",
+                produced,
+            )
+
+        success = self.scheduler.run(on_done)
+        if lock.steps:
+            # drop the files later steps moved or deleted
+            lock.refresh(self._step_inputs)
+            lock.save()
+        return success
+
+    def _print_timings(self):
+        """
+        Print how long each step took and the critical path of the run.
+        """
+        from rich.table import Table
+
+        path, total = self.scheduler.critical_path()
+        table = Table(title=f"Setup steps, critical path {total * 1000:.1f} ms")
+        table.add_column("Step")
+        table.add_column("Start ms", justify="right")
+        table.add_column("Duration ms", justify="right")
+        table.add_column("Critical path")
+
+        timings = sorted(self.scheduler.timings.items(), key=lambda item: item[1][0])
+        for name, (start, end) in timings:
+            table.add_row(
+                name,
+                f"{start * 1000:.1f}",
+                f"{(end - start) * 1000:.1f}",
+                "●" if name in path else "",
+            )
+        console.print(table)
+
+    def _run_staged(self, build) -> bool:
+        """
+        Run `build` in a staging folder (on tmpfs when there is one) and move the
+        finished project into place with one atomic rename, a failure leaves nothing behind.
+        returns: True if successful, False otherwise.
+        """
+        if os.path.exists(self.project_root):
+            console.print(f"\nDjango project already exists. ❌", style="bold red")
+            return False
+
+        directory = os.path.dirname(self.project_root)
+        try:
+            with tempfile.TemporaryDirectory(prefix="djang-setup-", dir=staging_dir()) as staging:
+                self._set_paths(staging)
+                try:
+                    built = build()
+                finally:
+                    self._set_paths(directory)
+
+                if not built:
+                    return False
+                with span("publish", "setup", target=self.project_root):
+                    publish(os.path.join(staging, self.django_project_name), self.project_root)
+            return True
+        except Exception as e:
+            record_error(e)
+            return False
+
+    def _print_trace(self, tracer):
+        """
+        Print the time spent per step, subprocess and file of the trace, and the errors it caught.
+        """
+        from rich.table import Table
+
+        table = Table(title=f"Trace written to {self.trace}")
+        table.add_column("Kind")
+        table.add_column("Name")
+        table.add_column("Count", justify="right")
+        table.add_column("Total ms", justify="right")
+        table.add_column("Max ms", justify="right")
+        table.add_column("Errors", justify="right")
+        for category, name, count, total, longest, errors in tracer.summary():
+            table.add_row(
+                category,
+                name,
+                str(count),
+                f"{total:.1f}",
+                f"{longest:.1f}",
+                str(errors) if errors else "",
+            )
+        console.print(table)
+
+        for name, error in tracer.errors():
+            console.print(f"{name}: {error} ❌", style="bold red")
+
+    def _traced(self, name, run) -> bool:
+        """
+        Call `run`, recording a trace of it to `self.trace` when it is set.
+        returns: what `run` returns.
+        """
+        if self.trace is None:
+            return run()
+
+        tracer = Tracer()
+        try:
+            with tracer.activate():
+                with span(name, "setup", project=self.django_project_name) as args:
+                    success = run()
+                    args["success"] = success
+        finally:
+            tracer.save(self.trace)
+            self._print_trace(tracer)
+        return success
+
+    def run_setup(self):
+        """Main method that creates everything"""
+        return self._traced("run_setup", self._setup)
+
+    def add_apps(self) -> bool:
+        """
+        Add the apps to the existing project in `project_root`: create the ones that
+        don't exist yet with their urls.py, add them to the INSTALLED_APPS of its settings
+        and include their urls in its root URLconf. Apps already there are left alone.
+        returns: True if successful, False otherwise.
+        """
+        return self._traced("add_apps", self._add_apps)
+
+    def _add_apps(self) -> bool:
+        try:
+            if not os.path.isdir(self.project_root):
+                raise ValueError(f"{self.project_root} is not a Django project folder")
+            index = ProjectIndex(self.project_root, self.files, self.settings)
+
+            # edits the buffered settings and URLconf only, raises before any app is
+            # rendered when they can't be registered
+            installed, included = index.add_apps(self.django_app_names)
+
+            new_apps = [
+                app_name
+                for app_name in self.django_app_names
+                if not os.path.exists(os.path.join(self.project_root, app_name))
+            ]
+            # the new apps, and the existing ones the URLconf now includes without a urls.py
+            without_urls = [
+                app_name
+                for app_name in self.django_app_names
+                if (app_name in new_apps or app_name in included)
+                and not os.path.exists(os.path.join(self.project_root, app_name, "urls.py"))
+            ]
+
+            created = False
+            try:
+                if new_apps:
+                    start_apps(new_apps, self.project_root)
+                created = not without_urls or self._create_app_urls_file(without_urls)
+            finally:
+                if not created:
+                    # the settings aren't written, so nothing half-added is left either
+                    for app_name in new_apps:
+                        shutil.rmtree(os.path.join(self.project_root, app_name), ignore_errors=True)
+                    for app_name in without_urls:
+                        if app_name not in new_apps and os.path.exists(
+                            os.path.join(self.project_root, app_name, "urls.py")
+                        ):
+                            os.remove(os.path.join(self.project_root, app_name, "urls.py"))
+            if not created:
+                return False
+
+            self.files.flush()
+
+            def relative(path):
+                return os.path.relpath(path, self.project_root)
+
+            console.print(
+                f"\nCreated {len(new_apps)} app(s), added {len(installed)} to INSTALLED_APPS "
+                f"({relative(index.settings.source.path)}) and {len(included)} to urlpatterns "
+                f"({relative(index.urls.source.path)}) successfully! ✅",
+                style="bold on blue",
+            )
+            return True
+        except Exception as e:
+            record_error(e)
+            console.print(f"\nCould not add the apps: {e} ❌", style="bold red")
+            return False
+
+    def _setup(self) -> bool:
+        """
+        Create or update the project, then bootstrap its virtualenv.
+        returns: True if successful, False otherwise.
+        """
+        existed = os.path.exists(self.project_root)
+        if os.path.exists(os.path.join(self.project_root, LOCK_FILE)):
+            success = self._update_project()
+        elif self.use_cache:
+            success = self._run_staged(self._create_from_cache)
+        else:
+            success = self._run_staged(self._run_steps)
+
+        if self.timings and self.scheduler is not None and self.scheduler.timings:
+            self._print_timings()
+
+        if success and self.bootstrap_venv:
+            success = self._bootstrap_venv()
+            if not success and not existed:
+                # the project was published by this run, a failed --venv leaves nothing behind either
+                shutil.rmtree(self.project_root, ignore_errors=True)
+
         if success:
             console.print(f"\nMake sure you set the env 'SETTING_FILE_PATH' to '{self.django_project_name}.settings.development' (for your development enviroment)\nor '{self.django_project_name}.settings.production' (for your production enviroment) before running the server.", style="bold white on yellow")
+
+        return success
+
+    async def run_setup_async(self):
+        """
+        `run_setup` for asyncio, runs in the loop's default executor
+        so the subprocesses and file I/O don't block the event loop.
+        returns: True if successful, False otherwise.
+        """
+        import asyncio
+        import contextvars
+        import functools
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(context.run, self.run_setup))
@@ -1,2 +1,76 @@
-from rich.console import Console
-console = Console()
\ No newline at end of file
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# set by `quiet()` and `redirect()`, per thread and per asyncio task
+_quiet = ContextVar("quiet", default=False)
+_redirect = ContextVar("redirect", default=None)
+
+
+class _LazyConsole:
+    """
+    Stand-in for rich's Console that only imports rich on first use,
+    so `djang-setup --help` and `--version` never pay for it.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, "_console", None)
+
+    def _get_console(self):
+        redirected = _redirect.get()
+        if redirected is not None:
+            return redirected
+        if self._console is None:
+            from rich.console import Console
+
+            object.__setattr__(self, "_console", Console())
+        return self._console
+
+    def print(self, *args, **kwargs):
+        if _quiet.get():
+            return
+        self._get_console().print(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._get_console(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_console(), name, value)
+
+
+@contextmanager
+def quiet():
+    """
+    Silence `console.print` for the current thread or task only,
+    unlike `console.quiet` which silences the whole process.
+    """
+    token = _quiet.set(True)
+    try:
+        yield
+    finally:
+        _quiet.reset(token)
+
+
+@contextmanager
+def redirect(file, width=None, color=False):
+    """
+    Send the console output of the current thread or task to `file`,
+    rendered for a terminal `width` columns wide, with colors when `color` is set.
+    """
+    from rich.console import Console
+
+    token = _redirect.set(
+        Console(
+            file=file,
+            width=width,
+            force_terminal=color,
+            no_color=not color,
+            highlight=color,
+        )
+    )
+    try:
+        yield
+    finally:
+        _redirect.reset(token)
+
+
+console = _LazyConsole()
@@ -0,0 +1,95 @@
+"""
+Container build files added with `--docker`: a multi-stage Dockerfile and its .dockerignore.
+"""
+import sys
+
+DOCKERFILE = """# syntax=docker/dockerfile:1
+# docker build -t {project} .
+# docker run --env-file .env.prod -p 8000:8000 {project}
+#
+# Each layer is rebuilt only when its inputs change: editing the code reuses the
+# dependencies layer, only a new requirements.txt reinstalls them.
+
+ARG PYTHON_VERSION={python}
+
+# Dependencies, keyed only on requirements.txt
+FROM python:${PYTHON_VERSION}-slim AS deps
+ENV PIP_DISABLE_PIP_VERSION_CHECK=1
+RUN python -m venv /opt/venv
+ENV PATH="/opt/venv/bin:$PATH"
+COPY requirements.txt /tmp/requirements.txt
+RUN --mount=type=cache,target=/root/.cache/pip \\
+    pip install -r /tmp/requirements.txt
+
+# Build, static files collected with the production settings
+FROM deps AS build
+WORKDIR /app
+COPY . .
+ENV SETTING_FILE_PATH={project}.settings.production
+# placeholder values, the real ones are only given to the running container
+RUN SECRET_KEY=collectstatic ALLOWED_HOSTS=localhost \\
+    python manage.py collectstatic --noinput
+
+# Runtime, slim and not running as root
+FROM python:${PYTHON_VERSION}-slim AS runtime
+ENV PYTHONDONTWRITEBYTECODE=1 \\
+    PYTHONUNBUFFERED=1 \\
+    PATH="/opt/venv/bin:$PATH" \\
+    SETTING_FILE_PATH={project}.settings.production
+RUN useradd --system --user-group --uid 10001 --no-create-home app
+WORKDIR /app
+COPY --from=deps /opt/venv /opt/venv
+COPY --from=build /app /app
+USER app
+EXPOSE 8000
+CMD {command}
+"""
+
+DOCKERIGNORE = """# Kept out of the build context: secrets, local environments and build output
+.env*
+.git
+.gitignore
+.dockerignore
+Dockerfile
+.djang-setup.lock
+env/
+venv/
+.venv/
+**/__pycache__
+**/*.py[cod]
+*.sqlite3
+staticfiles/
+media/
+.vscode/
+.idea/
+**/.DS_Store
+"""
+
+# STATIC_ROOT for collectstatic, already set by the performance profile
+STATIC_ROOT = """
+# collectstatic folder, filled when the image is built
+STATIC_ROOT = env("STATIC_ROOT", default=str(BASE_DIR / "staticfiles"))
+"""
+
+
+def python_version() -> str:
+    """
+    returns: the major.minor version of this python, the project was rendered with it.
+    """
+    return f"{sys.version_info.major}.{sys.version_info.minor}"
+
+
+def dockerfile(project_name, server) -> str:
+    """
+    returns: the Dockerfile of `project_name`, serving it with gunicorn.conf.py when there is a `server`.
+    """
+    if server is None:
+        # gunicorn reads the number of workers from WEB_CONCURRENCY
+        command = f'["gunicorn", "{project_name}.wsgi:application", "--bind", "0.0.0.0:8000"]'
+    else:
+        command = '["gunicorn", "--config", "gunicorn.conf.py"]'
+    return (
+        DOCKERFILE.replace("{project}", project_name)
+        .replace("{python}", python_version())
+        .replace("{command}", command)
+    )
@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import stat
+import time
+import socket
+import tempfile
+import threading
+
+try:
+    # For when running as part of the package
+    from .console import console, quiet, redirect
+except ImportError:
+    # For when running directly
+    from console import console, quiet, redirect
+
+
+# seconds without a request before `serve` exits
+IDLE_TIMEOUT = 600
+
+
+def socket_path() -> str:
+    """
+    The daemon's socket, $DJANG_SETUP_SOCKET, else in $XDG_RUNTIME_DIR or the temp folder.
+    """
+    path = os.environ.get("DJANG_SETUP_SOCKET")
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "djang-setup.sock")
+    return os.path.join(tempfile.gettempdir(), f"djang-setup-{os.getuid()}.sock")
+
+
+def _own_socket(path) -> bool:
+    """
+    returns: True when `path` is a socket of the current user. In a shared temp folder,
+    anything else may have been put there by another user to pose as the daemon.
+    """
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+
+def _connect(path):
+    """
+    returns: a socket connected to the daemon at `path`, or None when none of the current user is listening.
+    """
+    if not hasattr(socket, "AF_UNIX") or not _own_socket(path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def run_remote(project_name, app_names, options, path=None, out=None):
+    """
+    Thin client: ask a running daemon to create the project and stream
+    its output to `out` (stdout by default).
+    options: the `Cli` keyword arguments, `directory` should be absolute.
+    returns: True/False as `run_setup` does, or None when no daemon is listening.
+    """
+    out = out or sys.stdout
+    client = _connect(path or socket_path())
+    if client is None:
+        return None
+
+    request = {
+        "project_name": project_name,
+        "app_names": app_names,
+        "options": options,
+        "terminal": {
+            "width": _terminal_width(out),
+            "color": out.isatty(),
+        },
+    }
+    with client:
+        client.sendall(json.dumps(request).encode() + b"\n")
+        for line in client.makefile("rb"):
+            message = json.loads(line)
+            if "output" in message:
+                out.write(message["output"])
+                out.flush()
+            elif "success" in message:
+                return message["success"]
+    # the daemon went away mid-request
+    return False
+
+
+def _terminal_width(out):
+    try:
+        return os.get_terminal_size(out.fileno()).columns
+    except (OSError, ValueError, AttributeError) as e:
+        return 80
+
+
+class _Stream:
+    """
+    File-like object sending what the console writes back to the client as json lines,
+    shared by the threads of one request.
+    """
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.lock = threading.Lock()
+
+    def send(self, **message):
+        with self.lock:
+            try:
+                self.wfile.write(json.dumps(message).encode() + b"\n")
+                self.wfile.flush()
+            except OSError:
+                # the client went away, finish the project anyway
+                pass
+
+    def write(self, text):
+        if text:
+            self.send(output=text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def _create(request, stream) -> bool:
+    try:
+        # For when running as part of the package
+        from .cli import Cli
+    except ImportError:
+        # For when running directly
+        from cli import Cli
+
+    terminal = request.get("terminal", {})
+    with redirect(stream, width=terminal.get("width"), color=terminal.get("color", False)):
+        try:
+            django_cli = Cli(
+                request["project_name"],
+                request["app_names"],
+                **request.get("options", {}),
+            )
+            return django_cli.run_setup()
+        except Exception as e:
+            console.print(f"\nCould not create the project: {e} ❌", style="bold red")
+            return False
+
+
+def _warm_up():
+    """
+    Create a throwaway project so Django, Black and rich are imported
+    and initialised before the first request.
+    """
+    try:
+        # For when running as part of the package
+        from .cli import Cli
+    except ImportError:
+        # For when running directly
+        from cli import Cli
+
+    with tempfile.TemporaryDirectory() as directory:
+        with quiet():
+            Cli("warmup", ["warmup_app"], directory=directory).run_setup()
+
+
+def serve(path=None, jobs=None, idle_timeout=IDLE_TIMEOUT):
+    """
+    Run the daemon until it gets no request for `idle_timeout` seconds (never when 0).
+    jobs: projects created at the same time, further requests wait for a slot,
+    defaults to the number of CPUs.
+    """
+    import socketserver
+
+    path = path or socket_path()
+    jobs = jobs or os.cpu_count() or 1
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            stream = _Stream(self.wfile)
+            try:
+                request = json.loads(self.rfile.readline())
+            except ValueError as e:
+                stream.send(output="Invalid request\n")
+                stream.send(success=False)
+                return
+
+            self.server.begin()
+            try:
+                with self.server.slots:
+                    success = _create(request, stream)
+            finally:
+                self.server.end()
+            stream.send(success=success)
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self):
+            self.slots = threading.BoundedSemaphore(jobs)
+            self.lock = threading.Lock()
+            self.active = 0
+            self.last_request = time.monotonic()
+            # only the user running the daemon can connect
+            umask = os.umask(0o177)
+            try:
+                super().__init__(path, Handler)
+            finally:
+                os.umask(umask)
+
+        def begin(self):
+            with self.lock:
+                self.active += 1
+
+        def end(self):
+            with self.lock:
+                self.active -= 1
+                self.last_request = time.monotonic()
+
+        def watch_idle(self):
+            while True:
+                time.sleep(min(1.0, idle_timeout))
+                with self.lock:
+                    idle = self.active == 0 and time.monotonic() - self.last_request > idle_timeout
+                if idle:
+                    self.shutdown()
+                    return
+
+    existing = _connect(path)
+    if existing is not None:
+        existing.close()
+        raise RuntimeError(f"a daemon is already listening on {path}")
+    if os.path.lexists(path):
+        if not _own_socket(path):
+            raise RuntimeError(
+                f"{path} isn't a socket of yours, remove it or set DJANG_SETUP_SOCKET"
+            )
+        # left behind by a daemon that didn't exit cleanly
+        os.remove(path)
+
+    _warm_up()
+    server = Server()
+    try:
+        if idle_timeout:
+            threading.Thread(target=server.watch_idle, daemon=True).start()
+        console.print(
+            f"\nListening on {path} ({jobs} job(s) at a time) ✅", style="bold on blue"
+        )
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if _own_socket(path):
+            os.remove(path)
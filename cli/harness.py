@@ -0,0 +1,173 @@
+"""
+Load-test and profiling harness added to every app with `--bench`:
+a health view, a `bench_<app>` management command and a timing middleware.
+"""
+
+APP_URLS = """from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("health/", views.health, name="health"),
+]
+"""
+
+HEALTH_VIEW = '''
+
+def health(request):
+    """
+    Cheap endpoint for uptime checks and load tests, runs one trivial database query.
+    """
+    from django.db import connection
+    from django.http import JsonResponse
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return JsonResponse({"status": "ok", "app": "{app}"})
+'''
+
+BENCH_COMMAND = '''"""
+Benchmark endpoints in-process with Django's test client, no server or network needed.
+
+usage: python manage.py bench_{app} [PATH ...] [--requests 1000] [--warmup 50]
+"""
+
+import time
+import logging
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = "Benchmark endpoints of the {app} app: requests/sec, p50/p99 latency and queries per request."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", default=["/{app}/health/"])
+        parser.add_argument("--requests", "-n", type=int, default=1000)
+        parser.add_argument("--warmup", type=int, default=50)
+
+    def handle(self, *args, **options):
+        # the development timing middleware would log every request
+        logging.disable(logging.INFO)
+        try:
+            self.bench(options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def bench(self, options):
+        client = Client()
+        for path in options["paths"]:
+            for i in range(options["warmup"]):
+                client.get(path)
+
+            latencies = []
+            queries = []
+            start = time.perf_counter()
+            for i in range(options["requests"]):
+                with CaptureQueriesContext(connection) as captured:
+                    request_start = time.perf_counter()
+                    response = client.get(path)
+                    latencies.append(time.perf_counter() - request_start)
+                if response.status_code >= 400:
+                    raise CommandError(f"{path} returned {response.status_code}")
+                queries.append(len(captured.captured_queries))
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f"{path}: {len(latencies) / elapsed:.0f} req/s, "
+                f"p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+                f"p99 {percentile(latencies, 99) * 1000:.2f} ms, "
+                f"{statistics.mean(queries):.1f} queries/request "
+                f"({len(latencies)} requests)"
+            )
+'''
+
+TIMING_MIDDLEWARE = '''import time
+import logging
+
+from django.db import connection
+
+logger = logging.getLogger("{app}.timing")
+
+
+class TimingMiddleware:
+    """
+    Logs the duration and database queries of every request served by the {app} views,
+    and sends them in a Server-Timing header. Enabled in the development settings only.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        duration = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.func.__module__.split(".")[0] == "{app}":
+            logger.info(
+                "%s %s %s %.1fms %d queries",
+                request.method,
+                request.path,
+                response.status_code,
+                duration,
+                len(queries),
+            )
+            response["Server-Timing"] = f'app;dur={duration:.1f}, db;desc="{len(queries)} queries"'
+        return response
+'''
+
+DEV_SETTINGS = """
+
+# Request timing of every app, logged to the console (see <app>/middleware.py)
+MIDDLEWARE = [{middleware}] + MIDDLEWARE
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {{loggers}},
+}
+"""
+
+
+def health_view(app_name) -> str:
+    return HEALTH_VIEW.replace("{app}", app_name)
+
+
+def bench_command(app_name) -> str:
+    return BENCH_COMMAND.replace("{app}", app_name)
+
+
+def timing_middleware(app_name) -> str:
+    return TIMING_MIDDLEWARE.replace("{app}", app_name)
+
+
+def dev_settings(app_names) -> str:
+    """
+    returns: the development settings enabling the timing middleware of every app of `app_names`.
+    """
+    middleware = ", ".join(f'"{app_name}.middleware.TimingMiddleware"' for app_name in app_names)
+    loggers = ", ".join(
+        f'"{app_name}.timing": {{"handlers": ["console"], "level": "INFO"}}'
+        for app_name in app_names
+    )
+    return DEV_SETTINGS.replace("{middleware}", middleware).replace("{loggers}", loggers)
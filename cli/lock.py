@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+
+# generation manifest written at the root of every generated project
+LOCK_FILE = ".djang-setup.lock"
+LOCK_VERSION = 1
+
+# never recorded as step outputs
+IGNORED = {LOCK_FILE, "env", "__pycache__", ".git"}
+
+
+def file_hash(path) -> str:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def inputs_hash(inputs) -> str:
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def snapshot(root) -> dict:
+    """
+    returns: {path relative to `root`: content hash} of every generated file under `root`.
+    """
+    hashes = {}
+    for current, dirs, files in os.walk(root):
+        dirs[:] = [name for name in dirs if name not in IGNORED]
+        for filename in files:
+            if filename in IGNORED:
+                continue
+            path = os.path.join(current, filename)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            hashes[relative] = file_hash(path)
+    return hashes
+
+
+class GenerationLock:
+    """
+    Records, for every setup step, the hash of its inputs, whether it finished
+    and the content hashes of the files it produced (the last step writing a file owns it).
+    """
+
+    def __init__(self, root, steps=None):
+        self.root = root
+        self.steps = steps or {}
+
+    @classmethod
+    def load(cls, root):
+        """
+        returns: the lock of the project at `root`, or None if it has none.
+        """
+        try:
+            with open(os.path.join(root, LOCK_FILE), "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            return None
+        return cls(root, data.get("steps", {}))
+
+    def save(self):
+        with open(os.path.join(self.root, LOCK_FILE), "w") as file:
+            json.dump({"version": LOCK_VERSION, "steps": self.steps}, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+    def record(self, step_name, inputs, status, produced):
+        """
+        Record a step and the files it `produced` ({path: hash}),
+        taking them away from the steps that produced them earlier.
+        """
+        for record in self.steps.values():
+            record["outputs"] = {
+                path: digest
+                for path, digest in record["outputs"].items()
+                if path not in produced
+            }
+        self.steps[step_name] = {
+            "inputs": inputs_hash(inputs),
+            "status": status,
+            "outputs": produced,
+        }
+
+    def recorded_hash(self, path):
+        """
+        returns: the hash `path` had when a step last produced it, or None.
+        """
+        for record in self.steps.values():
+            if path in record["outputs"]:
+                return record["outputs"][path]
+        return None
+
+    def is_up_to_date(self, step_name, inputs, strict=False) -> bool:
+        """
+        A step is up to date when it finished, its inputs didn't change and
+        none of its outputs are missing. Outputs edited since are left alone like make does,
+        unless `strict` is set.
+        """
+        record = self.steps.get(step_name)
+        if record is None or record["status"] != "done":
+            return False
+        if record["inputs"] != inputs_hash(inputs):
+            return False
+        for path, digest in record["outputs"].items():
+            path = os.path.join(self.root, path)
+            if not os.path.exists(path):
+                return False
+            if strict and file_hash(path) != digest:
+                return False
+        return True
+
+    def refresh(self, inputs_for):
+        """
+        Rehash every recorded output on disk and the inputs of every step,
+        `inputs_for(step_name)` returns a step's inputs.
+        """
+        for name, record in self.steps.items():
+            record["inputs"] = inputs_hash(inputs_for(name))
+            record["outputs"] = {
+                path: file_hash(os.path.join(self.root, path))
+                for path in record["outputs"]
+                if os.path.exists(os.path.join(self.root, path))
+            }
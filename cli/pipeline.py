@@ -0,0 +1,197 @@
+import ast
+
+try:
+    # For when running as part of the package
+    from .tracing import span, file_span
+except ImportError:
+    # For when running directly
+    from tracing import span, file_span
+
+# black's default line length, new code is laid out to fit in it
+LINE_LENGTH = 88
+
+
+def fit(snippet, indent, suffix="") -> str:
+    """
+    Lay out the expression `snippet` at `indent`, followed by `suffix`.
+    Only a snippet too long for one line is formatted, with black.
+    returns: the indented line(s), without the final newline.
+    """
+    if len(indent) + len(snippet) + len(suffix) <= LINE_LENGTH:
+        return f"{indent}{snippet}{suffix}"
+
+    import black
+
+    mode = black.Mode(line_length=LINE_LENGTH - len(indent) - len(suffix))
+    with span("black", "format", snippet=snippet):
+        lines = black.format_str(snippet, mode=mode).rstrip("\n").splitlines()
+    lines[-1] += suffix
+    return "\n".join(f"{indent}{line}" if line else line for line in lines)
+
+
+class SourceFile:
+    """
+    A python file patched in place.
+
+    Edits replace the text spans of AST nodes (found with their position info)
+    and everything else, comments and layout included, is kept as it was.
+    The inserted code is written the way Black lays it out, so no pass over the whole file is needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with file_span(path, "read"):
+            # newline="": the line endings are kept as they are in the file
+            with open(path, "r", encoding="utf-8", newline="") as file:
+                self.source = file.read()
+            self.tree = ast.parse(self.source)
+        self.lines = self.source.splitlines(keepends=True)
+        # the inserted lines end the way the file's lines do
+        self.newline = "\r\n" if "\r\n" in self.source else "\n"
+        # offset of the first character of every line
+        self._line_starts = [0]
+        for line in self.lines:
+            self._line_starts.append(self._line_starts[-1] + len(line))
+        # (start, end, text) spans, applied by `render`
+        self.edits = []
+
+    def offset(self, lineno, col_offset) -> int:
+        """
+        returns: the offset in `source` of an AST position, `col_offset` counts utf-8 bytes.
+        """
+        line = self.lines[lineno - 1]
+        return self._line_starts[lineno - 1] + len(line.encode("utf-8")[:col_offset].decode("utf-8"))
+
+    def span(self, node) -> tuple:
+        """
+        returns: (start, end) offsets of `node` in `source`.
+        """
+        return (
+            self.offset(node.lineno, node.col_offset),
+            self.offset(node.end_lineno, node.end_col_offset),
+        )
+
+    def text(self, node) -> str:
+        start, end = self.span(node)
+        return self.source[start:end]
+
+    def indent(self, node) -> str:
+        line = self.lines[node.lineno - 1]
+        return line[: len(line) - len(line.lstrip())]
+
+    def replace(self, node, text):
+        """Replace the source of `node` with `text`."""
+        start, end = self.span(node)
+        self.edits.append((start, end, text))
+
+    def insert_after(self, node, text):
+        """Insert the lines of `text` after the line `node` ends on."""
+        offset = self._line_starts[node.end_lineno]
+        self.edits.append((offset, offset, text))
+
+    def extend_list(self, node, items):
+        """
+        Append the source snippets `items` to the list (or parenthesized tuple) literal `node`,
+        keeping its layout: one item per line when it spans several lines,
+        on the same line when it fits.
+        """
+        if not items:
+            return
+        start, end = self.span(node)
+        opening, closing_bracket = self.source[start], self.source[end - 1]
+        if (opening, closing_bracket) not in (("[", "]"), ("(", ")")):
+            raise ValueError(f"Can't extend {self.text(node)!r} in {self.path}, it has no brackets")
+        # offset of the closing bracket
+        closing = end - 1
+        closing_line = self._line_starts[node.end_lineno - 1]
+
+        if node.end_lineno > node.lineno and not self.source[closing_line:closing].strip():
+            # exploded list with the bracket on its own line, add a line per item
+            item_indent = self.indent(node.elts[-1]) if node.elts else self.indent(node) + "    "
+            if node.elts:
+                last_end = self.span(node.elts[-1])[1]
+                if not self.source[last_end:closing_line].split("#")[0].strip().startswith(","):
+                    self.edits.append((last_end, last_end, ","))
+            self.edits.append(
+                (closing_line, closing_line, "".join(fit(item, item_indent, ",") + "\n" for item in items))
+            )
+            return
+
+        elements = [self.text(element) for element in node.elts] + list(items)
+        # a one element tuple keeps its trailing comma
+        trailing = "," if opening == "(" and len(elements) == 1 else ""
+        inline = opening + ", ".join(elements) + trailing + closing_bracket
+        line_start = self._line_starts[node.lineno - 1]
+        line_end = self._line_starts[node.end_lineno]
+        line_length = (
+            len(self.source[line_start:start]) + len(inline) + len(self.source[end:line_end].rstrip("\r\n"))
+        )
+        if node.end_lineno == node.lineno and line_length <= LINE_LENGTH:
+            self.edits.append((start, end, inline))
+            return
+
+        # too long for one line, explode it like black does
+        indent = self.indent(node)
+        exploded = (
+            f"{opening}\n"
+            + "".join(fit(element, indent + "    ", ",") + "\n" for element in elements)
+            + f"{indent}{closing_bracket}"
+        )
+        self.edits.append((start, end, exploded))
+
+    def render(self) -> str:
+        """
+        returns: the source with every edit applied, the new lines ending with the file's `newline`.
+        """
+        pieces = []
+        position = 0
+        # stable: inserts at the same offset keep their order
+        for start, end, text in sorted(self.edits, key=lambda edit: (edit[0], edit[1])):
+            if start < position:
+                raise ValueError(f"Overlapping edits in {self.path}")
+            pieces.append(self.source[position:start])
+            if self.newline != "\n":
+                # the edits are written with "\n", the spans copied from the file may have its own
+                text = text.replace("\r\n", "\n").replace("\n", self.newline)
+            pieces.append(text)
+            position = end
+        pieces.append(self.source[position:])
+        return "".join(pieces)
+
+
+class FileBuffer:
+    """
+    In-memory buffer for the python files the setup patches.
+
+    Each file is read and parsed once, every step adds its edits to the same file,
+    and `flush` writes each changed file once.
+    """
+
+    def __init__(self):
+        self._files = {}
+
+    def source(self, path) -> SourceFile:
+        """
+        Return the `SourceFile` of `path`, parsing it from disk on first access.
+        """
+        path = str(path)
+        if path not in self._files:
+            self._files[path] = SourceFile(path)
+        return self._files[path]
+
+    def flush(self):
+        """
+        Apply the edits of every buffered file and write the changed ones to disk.
+        returns: the list of written paths.
+        """
+        written = []
+        for path, source_file in self._files.items():
+            if not source_file.edits:
+                continue
+            with file_span(path, "write"):
+                with open(path, "w", encoding="utf-8", newline="") as file:
+                    file.write(source_file.render())
+            written.append(path)
+
+        self._files.clear()
+        return written
@@ -0,0 +1,302 @@
+"""
+Index of an existing project for `add-app`: its settings module and root URLconf.
+
+Every file is parsed once and its top-level statements are indexed in one pass,
+the edits are appended to the INSTALLED_APPS and urlpatterns literals where they are,
+so adding apps takes the same time whatever the number of apps and url patterns already there.
+"""
+import os
+import ast
+
+try:
+    # For when running as part of the package
+    from .pipeline import fit
+except ImportError:
+    # For when running directly
+    from pipeline import fit
+
+# names the app url patterns need in the root URLconf
+URL_FUNCTIONS = ("include", "path")
+
+
+def module_path(project_root, module):
+    """
+    returns: the file of the dotted `module` inside `project_root`, None if there is none.
+    """
+    base = os.path.join(project_root, *module.split("."))
+    for path in (f"{base}.py", os.path.join(base, "__init__.py")):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _manage_py_settings(project_root):
+    """
+    returns: the settings module manage.py defaults DJANGO_SETTINGS_MODULE to, None if it isn't a literal.
+    """
+    path = os.path.join(project_root, "manage.py")
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "setdefault"
+            and len(node.args) == 2
+            and all(isinstance(arg, ast.Constant) for arg in node.args)
+            and node.args[0].value == "DJANGO_SETTINGS_MODULE"
+        ):
+            return node.args[1].value
+    return None
+
+
+def settings_module(project_root, module=None) -> str:
+    """
+    Find the settings module of the project in `project_root`: `module` when given, the default
+    of manage.py, $DJANGO_SETTINGS_MODULE or $SETTING_FILE_PATH, or the only
+    `<package>/settings.py` or `<package>/settings/base.py` of the project.
+    returns: the dotted module name.
+    """
+    candidates = [
+        module,
+        _manage_py_settings(project_root),
+        os.environ.get("DJANGO_SETTINGS_MODULE"),
+        os.environ.get("SETTING_FILE_PATH"),
+    ]
+    for candidate in candidates:
+        if candidate and module_path(project_root, candidate):
+            return candidate
+
+    found = []
+    for entry in sorted(os.listdir(project_root)):
+        for module_name in (f"{entry}.settings", f"{entry}.settings.base"):
+            if os.path.isfile(os.path.join(project_root, *module_name.split(".")) + ".py"):
+                found.append(module_name)
+    if len(found) != 1:
+        raise ValueError(
+            f"Can't tell the settings module of {project_root}, pass it with --settings"
+        )
+    return found[0]
+
+
+class ModuleIndex:
+    """
+    The top-level statements of a `SourceFile`, indexed in one pass:
+    the assignments by name, the names the imports bind and the star imports.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        # name: the first `name = ...`
+        self.assignments = {}
+        # name: every `name = ...` and `name += ...`
+        self.values = {}
+        # bound name: the import binding it
+        self.imported = {}
+        self.imports = []
+        self.star_imports = []
+
+        for node in source.tree.body:
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        self.assignments.setdefault(target.id, node)
+                        self.values.setdefault(target.id, []).append(node.value)
+            elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+                self.values.setdefault(node.target.id, []).append(node.value)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                self.imports.append(node)
+                for alias in node.names:
+                    if alias.name == "*":
+                        self.star_imports.append(node)
+                    else:
+                        self.imported[alias.asname or alias.name.split(".")[0]] = node
+
+    def constant(self, name):
+        """
+        returns: the value of `name = "<constant>"`, None if it isn't assigned a constant.
+        """
+        node = self.assignments.get(name)
+        if node is not None and isinstance(node.value, ast.Constant):
+            return node.value.value
+        return None
+
+    def literal(self, name):
+        """
+        The list or tuple literal new items of `name` go into:
+        `name = [...]`, or the last literal operand of `name = A + [...] + static(...)`, following names.
+        returns: the ast node, None if `name` isn't built from literals.
+        """
+        node = self.assignments.get(name)
+        return self._last_literal(node.value, {name}) if node is not None else None
+
+    def _last_literal(self, value, seen):
+        if isinstance(value, (ast.List, ast.Tuple)):
+            return value
+        if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add):
+            found = self._last_literal(value.right, seen)
+            return found if found is not None else self._last_literal(value.left, seen)
+        if isinstance(value, ast.Name) and value.id not in seen and value.id in self.assignments:
+            seen.add(value.id)
+            return self._last_literal(self.assignments[value.id].value, seen)
+        return None
+
+    def strings(self, name) -> set:
+        """
+        returns: the string constants anywhere in the values `name` is assigned or added,
+        and in the values of the names they refer to.
+        """
+        found = set()
+        pending = list(self.values.get(name, []))
+        seen = {name}
+        while pending:
+            for node in ast.walk(pending.pop()):
+                if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                    found.add(node.value)
+                elif isinstance(node, ast.Name) and node.id not in seen:
+                    seen.add(node.id)
+                    pending.extend(self.values.get(node.id, []))
+        return found
+
+    def star_modules(self, module, is_package=False) -> list:
+        """
+        returns: the dotted names of the modules `module` star imports, relative imports resolved.
+        """
+        modules = []
+        for node in self.star_imports:
+            if node.level:
+                parts = module.split(".")
+                # a module's relative imports start from its package
+                parts = parts[: len(parts) - node.level + (1 if is_package else 0)]
+                base = ".".join(parts)
+                modules.append(f"{base}.{node.module}" if node.module else base)
+            else:
+                modules.append(node.module)
+        return modules
+
+
+def _registered(app_name, installed) -> bool:
+    return app_name in installed or any(
+        entry.startswith(f"{app_name}.apps.") for entry in installed
+    )
+
+
+def add_installed_apps(settings, app_names, installed=None) -> list:
+    """
+    Append the apps of `app_names` missing from `installed` (default: the INSTALLED_APPS
+    of `settings`, a `ModuleIndex`) to its INSTALLED_APPS literal.
+    returns: the app names added.
+    """
+    if installed is None:
+        installed = settings.strings("INSTALLED_APPS")
+    missing = [app_name for app_name in app_names if not _registered(app_name, installed)]
+    if missing:
+        target = settings.literal("INSTALLED_APPS")
+        if target is None:
+            raise ValueError(f"INSTALLED_APPS of {settings.source.path} isn't a list or tuple")
+        settings.source.extend_list(target, [f'"{app_name}"' for app_name in missing])
+    return missing
+
+
+def add_url_includes(urls, app_names) -> list:
+    """
+    Append `path("<app>/", include("<app>.urls"))` to the urlpatterns of `urls` (a `ModuleIndex`)
+    for the apps of `app_names` it doesn't include yet, importing `path` and `include` if needed.
+    returns: the app names added.
+    """
+    included = urls.strings("urlpatterns")
+    missing = [app_name for app_name in app_names if f"{app_name}.urls" not in included]
+    if not missing:
+        return []
+
+    target = urls.literal("urlpatterns")
+    if target is None:
+        raise ValueError(f"urlpatterns of {urls.source.path} isn't a list or tuple")
+    urls.source.extend_list(
+        target, [f'path("{app_name}/", include("{app_name}.urls"))' for app_name in missing]
+    )
+
+    django_urls = [
+        node
+        for node in urls.imports
+        if isinstance(node, ast.ImportFrom) and node.module == "django.urls" and not node.level
+    ]
+    if any(node in urls.star_imports for node in django_urls):
+        return missing
+    unbound = [name for name in URL_FUNCTIONS if name not in urls.imported]
+    if unbound:
+        if django_urls:
+            # rebuild the import statement with them, `alias` nodes have no position before python 3.10
+            node = django_urls[0]
+            names = [f"{alias.name} as {alias.asname}" if alias.asname else alias.name for alias in node.names]
+            urls.source.replace(
+                node, fit(f"from django.urls import {', '.join(names + unbound)}", urls.source.indent(node))
+            )
+        elif urls.imports:
+            urls.source.insert_after(urls.imports[-1], f"from django.urls import {', '.join(unbound)}\n")
+        else:
+            raise ValueError(f"{urls.source.path} has no imports to add {', '.join(unbound)} after")
+    return missing
+
+
+class ProjectIndex:
+    """
+    Where apps are registered in the existing project at `project_root`: the INSTALLED_APPS
+    of its settings (following `from .base import *` and the like) and its root URLconf.
+
+    files: the `FileBuffer` the settings and URLconf are read from and edited in.
+    settings: the dotted settings module, found with `settings_module` when None.
+    """
+
+    def __init__(self, project_root, files, settings=None):
+        self.project_root = project_root
+        self.settings_module = settings_module(project_root, settings)
+
+        # the settings modules, the configured one first, then what it star imports
+        self.settings_chain = []
+        pending = [self.settings_module]
+        seen = set()
+        while pending:
+            module = pending.pop(0)
+            path = module_path(project_root, module)
+            if module in seen or path is None:
+                continue
+            seen.add(module)
+            index = ModuleIndex(files.source(path))
+            self.settings_chain.append(index)
+            pending.extend(index.star_modules(module, path.endswith("__init__.py")))
+
+        self.settings = self._first_assigning("INSTALLED_APPS")
+        if self.settings is None:
+            raise ValueError(f"INSTALLED_APPS isn't set in {self.settings_module}")
+
+        self.installed = set()
+        for index in self.settings_chain:
+            self.installed |= index.strings("INSTALLED_APPS")
+
+        root_urlconf = self._first_assigning("ROOT_URLCONF")
+        urlconf = root_urlconf.constant("ROOT_URLCONF") if root_urlconf else None
+        path = module_path(project_root, urlconf) if urlconf else None
+        if path is None:
+            raise ValueError(f"ROOT_URLCONF of {self.settings_module} isn't a module of the project")
+        self.urls = ModuleIndex(files.source(path))
+
+    def _first_assigning(self, name):
+        for index in self.settings_chain:
+            if name in index.assignments:
+                return index
+        return None
+
+    def add_apps(self, app_names) -> tuple:
+        """
+        Register the apps of `app_names` in INSTALLED_APPS and include their urls,
+        the ones already there are left alone.
+        returns: (apps added to INSTALLED_APPS, apps added to urlpatterns)
+        """
+        return (
+            add_installed_apps(self.settings, app_names, self.installed),
+            add_url_includes(self.urls, app_names),
+        )
@@ -0,0 +1,283 @@
+import os
+import sys
+import site
+import stat
+import shutil
+import tempfile
+import sysconfig
+import threading
+import contextvars
+import importlib.machinery
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # For when running as part of the package
+    from .bootstrap import pip_install_args
+    from . import tracing
+except ImportError:
+    # For when running directly
+    from bootstrap import pip_install_args
+    import tracing
+
+# Django's settings are configured once for the whole process, by the first render
+_settings_lock = threading.Lock()
+
+# template suffixes Django renames, and the rendered files it renders as templates
+TEMPLATE_SUFFIXES = ((".py-tpl", ".py"),)
+RENDERED_EXTENSIONS = (".py",)
+
+
+def _import_django():
+    """
+    Import django, installing it first if it is missing
+    (from $DJANG_SETUP_WHEELHOUSE when it is set).
+    returns: the django module.
+    """
+    try:
+        import django
+    except ImportError:
+        tracing.run(
+            [
+                sys.executable,
+                "-m",
+                "pip",
+                "install",
+                "--upgrade",
+                *pip_install_args(),
+                "django",
+            ],
+            check=True,
+        )
+        import importlib
+
+        importlib.invalidate_caches()
+        import django
+    return django
+
+
+def _black_format(paths):
+    """
+    In-process equivalent of the `black --fast` pass Django runs on rendered
+    templates, without spawning a process.
+    """
+    try:
+        import black
+    except ImportError:
+        return
+
+    mode = black.Mode()
+    with tracing.span("black", "format", paths=[str(path) for path in paths]):
+        for top_dir in paths:
+            for root, dirs, files in os.walk(top_dir):
+                for filename in files:
+                    if not filename.endswith(".py"):
+                        continue
+                    path = os.path.join(root, filename)
+                    with open(path, encoding="utf-8") as file:
+                        source = file.read()
+                    try:
+                        formatted = black.format_file_contents(source, fast=True, mode=mode)
+                    except black.NothingChanged:
+                        continue
+                    with open(path, "w", encoding="utf-8") as file:
+                        file.write(formatted)
+
+
+def _installed_path() -> list:
+    """
+    returns: the folders a fresh interpreter imports installed modules from: the standard
+    library and the site-packages, without the folders of the process djang-setup runs in.
+    """
+    paths = sysconfig.get_paths()
+    path = [
+        paths["stdlib"],
+        paths["platstdlib"],
+        os.path.join(paths["platstdlib"], "lib-dynload"),
+        os.path.join(sys.base_prefix, "DLLs"),
+        paths["purelib"],
+        paths["platlib"],
+    ]
+    # older virtualenvs ship a site module without getsitepackages
+    if hasattr(site, "getsitepackages"):
+        path += site.getsitepackages()
+    if site.ENABLE_USER_SITE:
+        path.append(site.getusersitepackages())
+    return [entry for entry in dict.fromkeys(path) if os.path.isdir(entry)]
+
+
+def _validate_name(name, kind):
+    """
+    Django's checks on a new project or app name: a valid identifier that doesn't shadow
+    an installed module. Only the standard library and site-packages are searched, as from
+    the fresh interpreter `django-admin` runs in: the modules the calling process has loaded
+    or can import from its own folders don't count.
+    """
+    if not name.isidentifier():
+        raise ValueError(
+            f"'{name}' is not a valid {kind} name. Please make sure the name is a valid identifier."
+        )
+
+    if (
+        name in sys.builtin_module_names
+        or importlib.machinery.PathFinder.find_spec(name, _installed_path()) is not None
+    ):
+        raise ValueError(
+            f"'{name}' conflicts with the name of an existing Python module and "
+            f"cannot be used as {'an' if kind == 'app' else 'a'} {kind} name. Please try another name."
+        )
+
+
+def _render_template(kind, name, target):
+    """
+    Render Django's `<kind>_template` for `name` into the `target` folder,
+    the way `startproject`/`startapp` do.
+    """
+    import django
+    from django.template import Context, Engine
+    from django.utils.version import get_docs_version
+
+    context = {
+        f"{kind}_name": name,
+        f"{kind}_directory": target,
+        f"camel_case_{kind}_name": "".join(x for x in name.title() if x != "_"),
+        "docs_version": get_docs_version(),
+        "django_version": django.__version__,
+    }
+    if kind == "project":
+        from django.core.checks.security.base import SECRET_KEY_INSECURE_PREFIX
+        from django.core.management.utils import get_random_secret_key
+
+        context["secret_key"] = SECRET_KEY_INSECURE_PREFIX + get_random_secret_key()
+    context = Context(context, autoescape=False)
+
+    template_dir = os.path.join(django.__path__[0], "conf", f"{kind}_template")
+    for root, dirs, files in os.walk(template_dir):
+        dirs[:] = [dirname for dirname in dirs if not dirname.startswith(".") and dirname != "__pycache__"]
+        relative_dir = os.path.relpath(root, template_dir).replace(f"{kind}_name", name)
+        os.makedirs(os.path.join(target, relative_dir), exist_ok=True)
+
+        for filename in files:
+            if filename.endswith((".pyo", ".pyc", ".py.class")):
+                continue
+            new_path = os.path.join(target, relative_dir, filename.replace(f"{kind}_name", name))
+            for old_suffix, new_suffix in TEMPLATE_SUFFIXES:
+                if new_path.endswith(old_suffix):
+                    new_path = new_path[: -len(old_suffix)] + new_suffix
+                    break
+
+            old_path = os.path.join(root, filename)
+            if new_path.endswith(RENDERED_EXTENSIONS):
+                with open(old_path, encoding="utf-8") as template_file:
+                    content = Engine().from_string(template_file.read()).render(context)
+                with open(new_path, "w", encoding="utf-8") as new_file:
+                    new_file.write(content)
+            else:
+                shutil.copyfile(old_path, new_path)
+            # the template's mode (manage.py is executable), writable like Django makes it
+            shutil.copymode(old_path, new_path)
+            mode = stat.S_IMODE(os.stat(new_path).st_mode)
+            if not mode & stat.S_IWUSR:
+                os.chmod(new_path, mode | stat.S_IWUSR)
+
+
+def _render(command, name, target):
+    """
+    Render the template of the `startproject`/`startapp` command into `target`.
+
+    The template is rendered into a private staging folder next to `target`
+    and moved into place afterwards, a failed render leaves nothing behind.
+    """
+    kind = "project" if command == "startproject" else "app"
+    _validate_name(name, kind)
+
+    staging = tempfile.mkdtemp(prefix=".djang-setup-", dir=os.path.dirname(target))
+    try:
+        rendered = os.path.join(staging, os.path.basename(target))
+        with tracing.span(f"{command} {name}", "render"):
+            _render_template(kind, name, rendered)
+            # the `black --fast` pass Django runs on rendered templates, without spawning it
+            _black_format([rendered])
+        os.rename(rendered, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _render_all(command, jobs):
+    """
+    Render every (name, target) of `jobs` with `command`, concurrently when there are several.
+    """
+    with tracing.span("import django", "render"):
+        django = _import_django()
+    from django.conf import settings
+
+    # the templates render with Django's default settings, two threads could race on configuring them
+    with _settings_lock:
+        if not settings.configured:
+            with tracing.span("django.setup", "render"):
+                settings.configure()
+                django.setup()
+
+    if len(jobs) == 1:
+        _render(command, *jobs[0])
+        return
+
+    with ThreadPoolExecutor() as pool:
+        # with the caller's context, to be traced with it
+        futures = [
+            pool.submit(contextvars.copy_context().run, _render, command, name, target)
+            for name, target in jobs
+        ]
+        for future in futures:
+            future.result()
+
+
+def start_project(project_name, target, use_subprocess=False):
+    """
+    Render Django's project template for `project_name` into `target`,
+    `target` must not exist yet.
+    """
+    if use_subprocess:
+        tracing.run(
+            ["django-admin", "startproject", project_name],
+            check=True,
+            cwd=os.path.dirname(target),
+        )
+        return
+
+    _render_all("startproject", [(project_name, target)])
+
+
+def _start_app_subprocess(app_name, project_root):
+    tracing.run(
+        [
+            sys.executable,
+            os.path.join(project_root, "manage.py"),
+            "startapp",
+            app_name,
+        ],
+        check=True,
+        cwd=project_root,
+    )
+
+
+def start_apps(app_names, project_root, use_subprocess=False):
+    """
+    Render Django's app template for every app of `app_names` inside `project_root`,
+    the apps are generated concurrently.
+    """
+    if use_subprocess:
+        with ThreadPoolExecutor() as pool:
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run, _start_app_subprocess, app_name, project_root
+                )
+                for app_name in app_names
+            ]
+            for future in futures:
+                future.result()
+        return
+
+    _render_all(
+        "startapp",
+        [(app_name, os.path.join(project_root, app_name)) for app_name in app_names],
+    )
@@ -0,0 +1,157 @@
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    # For when running as part of the package
+    from .tracing import span
+except ImportError:
+    # For when running directly
+    from tracing import span
+
+
+class Step:
+    """
+    A setup step: a callable returning True on success, the names of the steps
+    it needs to run after, and the project files it produces.
+
+    outputs: callable returning the paths (relative to the project root, files or folders)
+    the step writes. Steps without it may write anywhere, so they run alone.
+    """
+
+    def __init__(self, func, requires=(), outputs=None, name=None):
+        self.func = func
+        self.name = name or func.__name__
+        self.requires = tuple(requires)
+        self.outputs = outputs
+
+    @property
+    def exclusive(self) -> bool:
+        return self.outputs is None
+
+    def __repr__(self):
+        return f"Step({self.name!r}, requires={self.requires!r})"
+
+
+class Scheduler:
+    """
+    Runs steps as soon as the steps they require succeeded, independent steps
+    run concurrently on a thread pool. Stops scheduling at the first failure.
+    """
+
+    def __init__(self, steps, max_workers=None):
+        self.steps = {step.name: step for step in steps}
+        self.max_workers = max_workers
+        # name: (start, end) in seconds since the run started
+        self.timings = {}
+
+        for step in steps:
+            for name in step.requires:
+                if name not in self.steps:
+                    raise ValueError(f"Step '{step.name}' requires unknown step '{name}'")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> list:
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Step '{name}' is part of a dependency cycle")
+            visiting.add(name)
+            for required in self.steps[name].requires:
+                visit(required)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.steps:
+            visit(name)
+        return order
+
+    def run(self, on_done=None) -> bool:
+        """
+        Run every step, `on_done(step, result)` is called from this thread
+        as each step finishes, before the steps requiring it start.
+        returns: True if every step succeeded, False otherwise.
+        """
+        self.timings = {}
+        pending = list(self.order)
+        succeeded = set()
+        running = {}
+        failed = False
+        start = time.perf_counter()
+
+        def timed(step):
+            step_start = time.perf_counter() - start
+            try:
+                with span(step.name, "step") as args:
+                    args["success"] = bool(step.func())
+                    return args["success"]
+            finally:
+                self.timings[step.name] = (step_start, time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                if not failed:
+                    for name in list(pending):
+                        step = self.steps[name]
+                        if not all(required in succeeded for required in step.requires):
+                            continue
+                        # exclusive steps never overlap with another step
+                        if running and (
+                            step.exclusive
+                            or any(other.exclusive for other in running.values())
+                        ):
+                            continue
+                        pending.remove(name)
+                        # the steps see the caller's context (e.g. a quiet console)
+                        context = contextvars.copy_context()
+                        running[pool.submit(context.run, timed, step)] = step
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    try:
+                        result = bool(future.result())
+                    except Exception as e:
+                        result = False
+                    if on_done is not None:
+                        on_done(step, result)
+                    if result:
+                        succeeded.add(step.name)
+                    else:
+                        failed = True
+
+        return not failed and len(succeeded) == len(self.steps)
+
+    def critical_path(self) -> tuple:
+        """
+        The chain of dependent steps that took the longest, what bounds the run time.
+        returns: (list of step names, seconds)
+        """
+        finish = {}
+        previous = {}
+        for name in self.order:
+            if name not in self.timings:
+                continue
+            start, end = self.timings[name]
+            before = [required for required in self.steps[name].requires if required in finish]
+            slowest = max(before, key=lambda required: finish[required], default=None)
+            previous[name] = slowest
+            finish[name] = (end - start) + (finish[slowest] if slowest else 0.0)
+
+        if not finish:
+            return [], 0.0
+
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return list(reversed(path)), total
@@ -1,29 +1,340 @@
-import os
-import subprocess
+import sys
+import click
+
 try:
     # For when running as part of the package
+    from . import __version__
     from .console import console
-    from .cli import Cli
+    from .profiles import PROFILES
+    from .servers import SERVERS
 except ImportError:
     # For when running directly
+    from __init__ import __version__
     from console import console
-    from cli import Cli
+    from profiles import PROFILES
+    from servers import SERVERS
+
+# ANSI "erase display" + "cursor home", clears the screen without spawning `clear`/`cls`
+CLEAR_SCREEN = "\033[2J\033[H"
+
 
-def main():
-    if os.name == 'nt':
-        subprocess.run('cls', shell=True) # Windows
-    else:
-        subprocess.run('clear', shell=True) # Linux/MacOS
-    # subprocess.run(["clear"])
+@click.group(invoke_without_command=True)
+@click.version_option(__version__, prog_name="djang-setup")
+@click.option(
+    "--subprocess",
+    "use_subprocess",
+    is_flag=True,
+    help="Run django-admin/manage.py as subprocesses instead of in-process.",
+)
+@click.option(
+    "--cache",
+    "use_cache",
+    is_flag=True,
+    help="Copy the project from the skeleton cache, filling the cache on a miss.",
+)
+@click.option(
+    "--venv",
+    "bootstrap_venv",
+    is_flag=True,
+    help="Create a virtualenv in the project and pin its packages in requirements.txt.",
+)
+@click.option(
+    "--wheelhouse",
+    type=click.Path(exists=True, file_okay=False),
+    default=None,
+    help="Install the virtualenv from this folder of wheels only (or set DJANG_SETUP_WHEELHOUSE).",
+)
+@click.option(
+    "--requirement",
+    "-r",
+    "requirements",
+    multiple=True,
+    help="Package to install in the virtualenv, repeatable, defaults to django and django-environ.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="When updating an existing project, overwrite the files edited since they were generated.",
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    help="Print how long each step took and the critical path.",
+)
+@click.option(
+    "--profile",
+    type=click.Choice(PROFILES),
+    default=None,
+    help="Extra production settings: persistent DB connections, cached templates, cache backend...",
+)
+@click.option(
+    "--server",
+    type=click.Choice(list(SERVERS)),
+    default=None,
+    help="Write a gunicorn.conf.py with sync, gthread or uvicorn workers sized to the CPU count.",
+)
+@click.option(
+    "--bench",
+    is_flag=True,
+    help="Add a health view, a bench_<app> command and a dev timing middleware to every app.",
+)
+@click.option(
+    "--docker",
+    is_flag=True,
+    help="Add a multi-stage Dockerfile (cached dependency layer, non-root runtime) and .dockerignore.",
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write a Chrome trace (open it in Perfetto) of the steps, subprocesses and file I/O.",
+)
+@click.pass_context
+def main(
+    ctx,
+    use_subprocess,
+    use_cache,
+    bootstrap_venv,
+    wheelhouse,
+    requirements,
+    force,
+    timings,
+    profile,
+    server,
+    bench,
+    docker,
+    trace,
+):
+    """Set up a Django project, prompts for the project and app names when run without a command."""
+    ctx.obj = {
+        "use_subprocess": use_subprocess,
+        "use_cache": use_cache,
+        "bootstrap_venv": bootstrap_venv,
+        "wheelhouse": wheelhouse,
+        "requirements": list(requirements) or None,
+        "force": force,
+        "timings": timings,
+        "profile": profile,
+        "server": server,
+        "bench": bench,
+        "docker": docker,
+        "trace": trace,
+    }
+    if ctx.invoked_subcommand is not None:
+        return
+
+    if sys.stdout.isatty():
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
 
     console.rule("[bold red]Welcome to the Django project creator!")
 
     project_name = console.input("Enter the [bold red]Django project[/] name: ")
-    app_name = console.input("Enter the [bold red]Django app[/] name: ")
+    app_names = console.input(
+        "Enter the [bold red]Django app[/] name(s), separated by commas: "
+    )
+    app_names = [name.strip() for name in app_names.split(",") if name.strip()]
+
+    _create(project_name, app_names, ctx.obj)
+
+
+def _create(project_name, app_names, options, directory=None) -> bool:
+    """
+    Create the project through the daemon when one is running, in this process otherwise.
+    returns: True if successful, False otherwise.
+    """
+    import os
+
+    try:
+        from .daemon import run_remote
+    except ImportError:
+        from daemon import run_remote
+
+    options = dict(options, directory=os.path.abspath(directory or os.getcwd()))
+    os.makedirs(options["directory"], exist_ok=True)
+    if options["wheelhouse"]:
+        options["wheelhouse"] = os.path.abspath(options["wheelhouse"])
+    if options["trace"]:
+        options["trace"] = os.path.abspath(options["trace"])
+
+    success = run_remote(project_name, app_names, options)
+    if success is not None:
+        return success
+
+    # imported after the prompts, the user doesn't wait on it
+    try:
+        from .cli import Cli
+    except ImportError:
+        from cli import Cli
+
+    return Cli(project_name, app_names, **options).run_setup()
+
+
+@main.command()
+@click.argument("project_name")
+@click.argument("app_names", nargs=-1, required=True)
+@click.option(
+    "--directory",
+    "-C",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Folder the project is created in, defaults to the current directory.",
+)
+@click.pass_context
+def create(ctx, project_name, app_names, directory):
+    """Create PROJECT_NAME with APP_NAMES without prompts, through the daemon when it runs."""
+    if not _create(project_name, list(app_names), ctx.obj, directory):
+        sys.exit(1)
+
+
+@main.command("add-app")
+@click.argument("app_names", nargs=-1, required=True)
+@click.option(
+    "--directory",
+    "-C",
+    type=click.Path(exists=True, file_okay=False),
+    default=".",
+    help="Folder of the existing project (the one with manage.py), defaults to the current directory.",
+)
+@click.option(
+    "--settings",
+    default=None,
+    help="Dotted settings module of the project, read from manage.py when not given.",
+)
+@click.pass_context
+def add_app(ctx, app_names, directory, settings):
+    """Add APP_NAMES to an existing project, to its INSTALLED_APPS and root URLconf."""
+    import os
+
+    try:
+        from .cli import Cli
+    except ImportError:
+        from cli import Cli
+
+    project_root = os.path.abspath(directory)
+    django_cli = Cli(
+        os.path.basename(project_root),
+        list(app_names),
+        directory=os.path.dirname(project_root),
+        trace=ctx.obj["trace"] and os.path.abspath(ctx.obj["trace"]),
+        settings=settings,
+    )
+    if not django_cli.add_apps():
+        sys.exit(1)
+
+
+@main.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    default=None,
+    help="Socket to listen on, defaults to $DJANG_SETUP_SOCKET or one in $XDG_RUNTIME_DIR.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=None,
+    help="Projects created at the same time, defaults to the number of CPUs.",
+)
+@click.option(
+    "--idle-timeout",
+    type=float,
+    default=600,
+    show_default=True,
+    help="Exit after this many seconds without a request, 0 to never exit.",
+)
+def serve(socket_path, jobs, idle_timeout):
+    """Keep Django and Black imported and create projects for `create` and the prompt."""
+    try:
+        from .daemon import serve as serve_forever
+    except ImportError:
+        from daemon import serve as serve_forever
+
+    try:
+        serve_forever(socket_path, jobs, idle_timeout)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        console.print(f"\nCould not start the daemon: {e} ❌", style="bold red")
+        sys.exit(1)
+
+
+@main.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--workers",
+    "-j",
+    type=int,
+    default=None,
+    help="Number of projects created in parallel, defaults to the number of CPUs.",
+)
+@click.pass_context
+def batch(ctx, manifest, workers):
+    """Create every project listed in a JSON or TOML MANIFEST, without prompts."""
+    try:
+        from .batch import load_manifest, run_batch
+    except ImportError:
+        from batch import load_manifest, run_batch
+
+    try:
+        entries = load_manifest(manifest)
+    except Exception as e:
+        console.print(f"\nCould not read manifest: {e} ❌", style="bold red")
+        sys.exit(1)
+
+    if not run_batch(entries, workers, **ctx.obj):
+        sys.exit(1)
+
+
+@main.group()
+def cache():
+    """Manage the cached project skeletons."""
+
+
+@cache.command("ls")
+def cache_ls():
+    """List the cached skeletons, most recently used first."""
+    import datetime
+    from rich.table import Table
+
+    try:
+        from .cache import SkeletonCache
+    except ImportError:
+        from cache import SkeletonCache
+
+    skeleton_cache = SkeletonCache()
+    table = Table(title=f"Skeleton cache: {skeleton_cache.root}")
+    table.add_column("Key")
+    table.add_column("Django")
+    table.add_column("Options")
+    table.add_column("Hits", justify="right")
+    table.add_column("Last used")
+    table.add_column("Size", justify="right")
+
+    for meta in skeleton_cache.entries():
+        table.add_row(
+            meta["digest"][:12],
+            meta["key"]["django"],
+            ", ".join(f"{k}={v}" for k, v in sorted(meta["key"]["options"].items())) or "-",
+            str(meta["hits"]),
+            datetime.datetime.fromtimestamp(meta["last_used"]).strftime("%Y-%m-%d %H:%M"),
+            f"{meta['size'] / 1024:.1f} KiB",
+        )
+    console.print(table)
+
+
+@cache.command("clear")
+def cache_clear():
+    """Remove every cached skeleton."""
+    try:
+        from .cache import SkeletonCache
+    except ImportError:
+        from cache import SkeletonCache
 
-    django_cli = Cli(project_name, app_name)
-    django_cli.run_setup()
+    removed = SkeletonCache().clear()
+    console.print(f"\nRemoved {removed} cached skeleton(s) ✅", style="bold on blue")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
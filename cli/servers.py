@@ -0,0 +1,117 @@
+"""
+Application server configs, a gunicorn.conf.py for each kind of worker.
+"""
+
+# worker class, app module and default (workers, threads) as expressions of `cpus`
+SERVERS = {
+    # one request per process, 2n+1 processes keeps every CPU busy while some wait on I/O
+    "sync": ("sync", "wsgi", "cpus * 2 + 1", "1"),
+    # fewer processes with a few threads each, for apps waiting on the database or APIs
+    "gthread": ("gthread", "wsgi", "cpus + 1", "4"),
+    # an event loop per CPU running the ASGI app
+    "uvicorn": ("uvicorn_worker.UvicornWorker", "asgi", "cpus", "1"),
+}
+
+# packages each kind of worker needs, uvicorn's gunicorn worker class moved to uvicorn-worker
+SERVER_PACKAGES = {"uvicorn": ("gunicorn", "uvicorn", "uvicorn-worker")}
+
+# versions the configs were tested with, pinned when djang-setup's environment doesn't have them
+SERVER_VERSIONS = {"gunicorn": "26.2.0", "uvicorn": "0.54.0", "uvicorn-worker": "0.4.0"}
+
+GUNICORN_CONFIG = '''"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py
+
+Workers and threads follow the CPUs this server may use,
+set the GUNICORN_* and WEB_CONCURRENCY keys of .env.prod (or the environment) to override them.
+"""
+
+import os
+
+import environ
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+env = environ.Env()
+environ.Env.read_env(os.path.join(BASE_DIR, ".env.prod"))
+
+# the settings module wsgi.py/asgi.py load
+os.environ.setdefault("SETTING_FILE_PATH", "{project}.settings.production")
+
+
+def _cpu_count():
+    try:
+        # CPUs this process may run on, e.g. limited by a container
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+cpus = _cpu_count()
+
+wsgi_app = "{project}.{module}:application"
+worker_class = env("GUNICORN_WORKER_CLASS", default="{worker_class}")
+workers = env.int("WEB_CONCURRENCY", default={workers})
+threads = env.int("GUNICORN_THREADS", default={threads})
+bind = env("GUNICORN_BIND", default="0.0.0.0:8000")
+timeout = env.int("GUNICORN_TIMEOUT", default=30)
+keepalive = env.int("GUNICORN_KEEPALIVE", default=5)
+
+# recycle workers now and then so a leak can't grow forever
+max_requests = env.int("GUNICORN_MAX_REQUESTS", default=1000)
+max_requests_jitter = env.int("GUNICORN_MAX_REQUESTS_JITTER", default=100)
+'''
+
+SERVER_ENV = """
+# Application server (gunicorn.conf.py)
+# worker processes, {workers} when unset
+# WEB_CONCURRENCY=4
+# threads per worker, {threads} when unset
+# GUNICORN_THREADS=4
+GUNICORN_BIND=0.0.0.0:8000
+GUNICORN_TIMEOUT=30
+GUNICORN_KEEPALIVE=5
+GUNICORN_MAX_REQUESTS=1000
+GUNICORN_MAX_REQUESTS_JITTER=100
+"""
+
+
+def gunicorn_config(project_name, server) -> str:
+    """
+    returns: the gunicorn.conf.py of `project_name` for `server` ("sync", "gthread" or "uvicorn").
+    """
+    worker_class, module, workers, threads = SERVERS[server]
+    return (
+        GUNICORN_CONFIG.replace("{project}", project_name)
+        .replace("{module}", module)
+        .replace("{worker_class}", worker_class)
+        .replace("{workers}", workers)
+        .replace("{threads}", threads)
+    )
+
+
+def server_env(server) -> str:
+    """
+    returns: the keys `server` adds to .env.prod.
+    """
+    if server is None:
+        return ""
+    worker_class, module, workers, threads = SERVERS[server]
+    return SERVER_ENV.replace("{workers}", workers).replace("{threads}", threads)
+
+
+def server_requirements(server) -> list:
+    """
+    The packages `server` runs with, pinned like `default_requirements`: to the versions
+    installed next to djang-setup, else to the ones of `SERVER_VERSIONS`.
+    """
+    if server is None:
+        return []
+    from importlib import metadata
+
+    requirements = []
+    for name in SERVER_PACKAGES.get(server, ("gunicorn",)):
+        try:
+            requirements.append(f"{name}=={metadata.version(name)}")
+        except metadata.PackageNotFoundError:
+            requirements.append(f"{name}=={SERVER_VERSIONS[name]}")
+    return requirements
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+
+# Linux tmpfs, the project is built in memory there
+TMPFS = "/dev/shm"
+
+
+def staging_dir() -> str:
+    """
+    Folder projects are built in before being published,
+    $DJANG_SETUP_STAGING_DIR, then tmpfs when available, then the system temp folder.
+    """
+    if os.environ.get("DJANG_SETUP_STAGING_DIR"):
+        return os.environ["DJANG_SETUP_STAGING_DIR"]
+    if os.path.isdir(TMPFS) and os.access(TMPFS, os.W_OK | os.X_OK):
+        return TMPFS
+    return tempfile.gettempdir()
+
+
+def publish(staged, target):
+    """
+    Move the finished `staged` folder to `target` with one atomic rename.
+
+    When the staging folder is on another filesystem (tmpfs, local disk vs a network
+    mount) the tree is first copied next to `target`, then renamed into place.
+    """
+    try:
+        os.rename(staged, target)
+        return
+    except OSError as e:
+        if os.path.exists(target):
+            raise
+
+    parent = os.path.dirname(target)
+    sibling = tempfile.mkdtemp(prefix=".djang-setup-", dir=parent)
+    try:
+        copied = os.path.join(sibling, os.path.basename(target))
+        shutil.copytree(staged, copied, symlinks=True)
+        os.rename(copied, target)
+    finally:
+        shutil.rmtree(sibling, ignore_errors=True)
@@ -0,0 +1,235 @@
+"""
+Run tracing for `--trace FILE`: spans for every step, subprocess and black run,
+an event for every file opened, written as Chrome trace-event JSON (Perfetto, chrome://tracing).
+
+Nothing is recorded unless a `Tracer` is active in the current thread or task.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import traceback
+import subprocess
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_tracer = ContextVar("tracer", default=None)
+# the spans open in the current thread or task, innermost last
+_open_spans = ContextVar("open_spans", default=())
+# set while a file span (or the tracer itself) reads or writes, its opens aren't recorded again
+_in_file_span = ContextVar("in_file_span", default=False)
+
+# span categories of file I/O, see `file_span`
+FILE_CATEGORIES = ("read", "write")
+
+_audit_hook_lock = threading.Lock()
+_audit_hook_installed = False
+
+# files of the interpreter and installed packages, opened by imports, not recorded
+_IGNORED_PREFIXES = tuple(
+    {os.path.join(prefix, "") for prefix in (sys.prefix, sys.base_prefix, sys.exec_prefix)}
+)
+
+
+def _audit_hook(event, args):
+    # called for every audited event of the process, keep the common case cheap
+    if event != "open":
+        return
+    tracer = _tracer.get()
+    if tracer is None or _in_file_span.get():
+        return
+    path, mode, flags = args
+    if not isinstance(path, (str, bytes)) or flags & getattr(os, "O_DIRECTORY", 0):
+        return
+    path = os.fsdecode(path)
+    if path.startswith(_IGNORED_PREFIXES) or path.endswith(".pyc"):
+        return
+    if mode is None:
+        mode = "w" if flags & (os.O_WRONLY | os.O_RDWR) else "r"
+    category = "write" if set(mode) & set("wax+") else "read"
+    tracer.instant(path, category, mode=mode)
+
+
+def _install_audit_hook():
+    """
+    Audit hooks can't be removed, install ours once and only when tracing is first used.
+    """
+    global _audit_hook_installed
+    with _audit_hook_lock:
+        if not _audit_hook_installed:
+            sys.addaudithook(_audit_hook)
+            _audit_hook_installed = True
+
+
+class Tracer:
+    """
+    Collects the spans of one run, see `span`, `run` and `record_error`.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.start = time.perf_counter()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def _now(self) -> float:
+        """Microseconds since the tracer started."""
+        return (time.perf_counter() - self.start) * 1_000_000
+
+    def _add(self, event):
+        event["pid"] = self.pid
+        event["tid"] = threading.get_ident()
+        with self.lock:
+            self.events.append(event)
+
+    def instant(self, name, category, **args):
+        """Record a point in time (a file opened), shown as a tick on the thread's track."""
+        self._add(
+            {"name": name, "cat": category, "ph": "i", "s": "t", "ts": self._now(), "args": args}
+        )
+
+    @contextmanager
+    def activate(self):
+        """
+        Trace what runs in the current thread or task,
+        and in the threads started with a copy of its context.
+        """
+        _install_audit_hook()
+        token = _tracer.set(self)
+        try:
+            yield self
+        finally:
+            _tracer.reset(token)
+
+    def save(self, path):
+        """Write the Chrome trace-event JSON to `path`."""
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        with self.lock:
+            events = list(self.events)
+        # name the tracks of the threads still alive, the others keep their id
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": tid,
+                "args": {"name": thread_names.get(tid, str(tid))},
+            }
+            for tid in sorted({event["tid"] for event in events})
+        ]
+
+        token = _in_file_span.set(True)
+        try:
+            with open(path, "w") as file:
+                json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, file)
+        finally:
+            _in_file_span.reset(token)
+
+    def summary(self) -> list:
+        """
+        The spans grouped by name, the files read and written grouped in one row each.
+        returns: [(category, name, count, total ms, max ms, errors)], slowest first.
+        """
+        rows = {}
+        with self.lock:
+            events = [event for event in self.events if event["ph"] in ("X", "i")]
+        for event in events:
+            name = "files" if event["cat"] in FILE_CATEGORIES else event["name"]
+            duration = event.get("dur", 0.0) / 1000
+            count, total, longest, errors = rows.get((event["cat"], name), (0, 0.0, 0.0, 0))
+            rows[(event["cat"], name)] = (
+                count + 1,
+                total + duration,
+                max(longest, duration),
+                errors + ("error" in event["args"]),
+            )
+        return sorted(
+            ((category, name, *values) for (category, name), values in rows.items()),
+            key=lambda row: row[3],
+            reverse=True,
+        )
+
+    def errors(self) -> list:
+        """
+        returns: [(span name, error)] of the spans that failed.
+        """
+        with self.lock:
+            return [
+                (event["name"], event["args"]["error"])
+                for event in self.events
+                if event["ph"] == "X" and "error" in event["args"]
+            ]
+
+
+@contextmanager
+def span(name, category, **args):
+    """
+    Record the duration of the block as a span, with `args` and the exception it raises.
+    A no-op when no tracer is active.
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        yield args
+        return
+
+    token = _open_spans.set(_open_spans.get() + (args,))
+    start = tracer._now()
+    try:
+        yield args
+    except BaseException as e:
+        args.setdefault("error", _describe(e))
+        raise
+    finally:
+        _open_spans.reset(token)
+        duration = tracer._now() - start
+        tracer._add(
+            {"name": name, "cat": category, "ph": "X", "ts": start, "dur": duration, "args": args}
+        )
+
+
+@contextmanager
+def file_span(path, category):
+    """
+    `span` of reading ("read") or writing ("write") the file `path`.
+    """
+    token = _in_file_span.set(True)
+    try:
+        with span(str(path), category) as args:
+            yield args
+    finally:
+        _in_file_span.reset(token)
+
+
+def record_error(error):
+    """
+    Attach an exception that is handled (e.g. a step returning False) to the innermost open span.
+    """
+    spans = _open_spans.get()
+    if spans:
+        spans[-1].setdefault("error", _describe(error))
+
+
+def _describe(error) -> str:
+    """returns: the exception type and message, e.g. "FileExistsError: [Errno 17] ..."."""
+    return "".join(traceback.format_exception_only(type(error), error)).strip()
+
+
+def run(command, **kwargs):
+    """
+    `subprocess.run` recorded as a span, with the command and its exit code.
+    """
+    command = [str(part) for part in command]
+    # `python -m pip` and `python manage.py` are named after what they run
+    name = os.path.basename(command[0])
+    if len(command) > 2 and name.startswith("python"):
+        name = command[2] if command[1] == "-m" else os.path.basename(command[1])
+
+    with span(name, "subprocess", command=command) as args:
+        try:
+            result = subprocess.run(command, **kwargs)
+        except subprocess.CalledProcessError as e:
+            args["exit_code"] = e.returncode
+            raise
+        args["exit_code"] = result.returncode
+        return result
@@ -5,11 +5,11 @@ setup(
     version='0.0.7',
     include_package_data=True,
     install_requires=[
-        "astor==0.8.1",
         "black==24.10.0",
         "click==8.1.8",
         "rich==13.9.4",
-        "django-environ==0.11.2"
+        "django-environ==0.11.2",
+        "tomli>=1.1.0; python_version < '3.11'",
     ],
     entry_points={
         'console_scripts': [
@@ -0,0 +1,119 @@
+"""
+Tests of the span-edit patcher (`SourceFile`/`FileBuffer`) and the `ModuleIndex` built on it.
+
+usage: python -m unittest discover tests  (or pytest)
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from cli.pipeline import FileBuffer
+from cli.project import ModuleIndex, add_installed_apps, add_url_includes
+
+
+class PatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def patch(self, text, edit, newline=None):
+        """
+        Write `text` to a file, call `edit` with its `ModuleIndex` and flush the edits.
+        returns: the patched file, line endings included.
+        """
+        path = os.path.join(self.directory, "module.py")
+        with open(path, "w", encoding="utf-8", newline=newline) as file:
+            file.write(text)
+        files = FileBuffer()
+        edit(ModuleIndex(files.source(path)))
+        files.flush()
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            return file.read()
+
+
+class ModuleIndexTests(PatcherTestCase):
+    def test_literal_follows_names_and_additions(self):
+        def check(index):
+            self.assertEqual(index.literal("urlpatterns").elts[0].value, "kept")
+            self.assertEqual(index.literal("APPS").elts[0].value, "local")
+            self.assertIsNone(index.literal("OTHER"))
+
+        self.patch(
+            'urlpatterns = ["kept"] + static("/media/")\n'
+            'BASE = ["django"]\n'
+            'APPS = BASE + ["local"]\n'
+            "OTHER = build()\n",
+            check,
+        )
+
+    def test_strings_follow_names(self):
+        def check(index):
+            self.assertEqual(index.strings("INSTALLED_APPS"), {"django", "shop", "extra"})
+
+        self.patch(
+            'BASE = ["django"]\nINSTALLED_APPS = BASE + ["shop"]\nINSTALLED_APPS += ["extra"]\n',
+            check,
+        )
+
+
+class SourceFileTests(PatcherTestCase):
+    def test_extend_list_on_one_line(self):
+        text = self.patch(
+            'INSTALLED_APPS = ["django"]  # apps\n',
+            lambda index: add_installed_apps(index, ["shop"]),
+        )
+        self.assertEqual(text, 'INSTALLED_APPS = ["django", "shop"]  # apps\n')
+
+    def test_extend_exploded_list(self):
+        text = self.patch(
+            'INSTALLED_APPS = [\n    "django",\n    # local\n]\n',
+            lambda index: add_installed_apps(index, ["shop", "django"]),
+        )
+        self.assertEqual(text, 'INSTALLED_APPS = [\n    "django",\n    # local\n    "shop",\n]\n')
+
+    def test_url_includes_extend_the_import(self):
+        text = self.patch(
+            "from django.contrib import admin\n"
+            "from django.urls import path  # routes\n\n"
+            'urlpatterns = [\n    path("admin/", admin.site.urls),\n]\n',
+            lambda index: add_url_includes(index, ["shop"]),
+        )
+        self.assertEqual(
+            text,
+            "from django.contrib import admin\n"
+            "from django.urls import path, include  # routes\n\n"
+            'urlpatterns = [\n    path("admin/", admin.site.urls),\n'
+            '    path("shop/", include("shop.urls")),\n]\n',
+        )
+
+    def test_url_includes_add_the_import(self):
+        text = self.patch(
+            "import os\n\nurlpatterns = []\n",
+            lambda index: add_url_includes(index, ["shop"]),
+        )
+        self.assertEqual(
+            text,
+            "import os\nfrom django.urls import include, path\n\n"
+            'urlpatterns = [path("shop/", include("shop.urls"))]\n',
+        )
+
+    def test_crlf_line_endings_are_kept(self):
+        text = self.patch(
+            'INSTALLED_APPS = [\n    "django",\n]\n',
+            lambda index: add_installed_apps(index, ["shop"]),
+            newline="\r\n",
+        )
+        self.assertEqual(text, 'INSTALLED_APPS = [\r\n    "django",\r\n    "shop",\r\n]\r\n')
+
+    def test_unchanged_file_is_not_written(self):
+        path = os.path.join(self.directory, "module.py")
+        with open(path, "w") as file:
+            file.write('INSTALLED_APPS = ["shop"]\n')
+        files = FileBuffer()
+        add_installed_apps(ModuleIndex(files.source(path)), ["shop"])
+        self.assertEqual(files.flush(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
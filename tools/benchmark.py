@@ -0,0 +1,251 @@
+"""
+Benchmark Cli.run_setup and each of its steps.
+
+Every sample creates two projects in fresh temporary directories: one with
+Cli.run_setup as a whole (staging, scheduler, generation lock and publish included),
+one calling every step on its own (_create_project, _create_settings, ...).
+    - cold: each sample runs in a new interpreter, the imports done by the steps included
+    - warm: samples run back to back in one interpreter after a warmup run
+Peak memory is measured per step with tracemalloc in a separate run so it
+doesn't skew the timings.
+
+usage:
+    python tools/benchmark.py --runs 20 --output bench.json
+    python tools/benchmark.py --python venvs/dj42/bin/python --python venvs/dj50/bin/python
+    python tools/benchmark.py --compare old.json --threshold 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_SETUP = "run_setup"
+
+
+def _time_steps(trace_memory=False) -> dict:
+    """
+    Create one project calling the steps one after the other, timing each on its own.
+    returns: {step name: seconds} or {step name: peak bytes} with `trace_memory`.
+    """
+    import tracemalloc
+    from cli.cli import Cli
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        django_cli = Cli("benchproject", "benchapp", directory=directory)
+        if trace_memory:
+            tracemalloc.start()
+
+        for step in django_cli._steps():
+            if trace_memory:
+                tracemalloc.reset_peak()
+            step_start = time.perf_counter()
+            if not step.func():
+                raise RuntimeError(f"{step.name} failed")
+            if trace_memory:
+                results[step.name] = tracemalloc.get_traced_memory()[1]
+            else:
+                results[step.name] = time.perf_counter() - step_start
+
+        if trace_memory:
+            tracemalloc.stop()
+    return results
+
+
+def _time_run_setup(trace_memory=False) -> dict:
+    """
+    Create one project with `Cli.run_setup`, staging, scheduler, lock and publish included.
+    returns: {"run_setup": seconds} or {"run_setup": peak bytes} with `trace_memory`.
+    """
+    import tracemalloc
+    from cli.cli import Cli
+
+    with tempfile.TemporaryDirectory() as directory:
+        django_cli = Cli("benchproject", "benchapp", directory=directory)
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if not django_cli.run_setup():
+            raise RuntimeError("run_setup failed")
+        elapsed = time.perf_counter() - start
+        if trace_memory:
+            elapsed = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {RUN_SETUP: elapsed}
+
+
+# what a sample times, the steps on their own and run_setup as a whole
+PARTS = {"steps": _time_steps, RUN_SETUP: _time_run_setup}
+
+
+def _run_once(parts=tuple(PARTS), trace_memory=False) -> dict:
+    """
+    Time every part of `parts` once.
+    returns: {name: seconds} or {name: peak bytes} with `trace_memory`.
+    """
+    from cli.console import console
+
+    console.quiet = True
+    results = {}
+    for part in parts:
+        results.update(PARTS[part](trace_memory))
+    return results
+
+
+def _worker(mode, runs, part=None) -> dict:
+    """
+    Body of a benchmark subprocess, prints its samples as json.
+    """
+    sys.path.insert(0, ROOT)
+    parts = (part,) if part else tuple(PARTS)
+    if mode == "warm":
+        _run_once(parts)
+    samples = [_run_once(parts) for i in range(runs)]
+    memory = _run_once(parts, trace_memory=True) if mode == "warm" else {}
+
+    import django
+
+    return {"django": django.__version__, "samples": samples, "memory": memory}
+
+
+def _spawn(python, mode, runs, part=None) -> dict:
+    command = [python, os.path.abspath(__file__), "--worker", mode, "--runs", str(runs)]
+    if part:
+        command += ["--part", part]
+    result = subprocess.run(
+        command,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def _percentile(values, percent) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def _summarize(samples, memory) -> dict:
+    summary = {}
+    for name in samples[0]:
+        values = [sample[name] * 1000 for sample in samples]
+        summary[name] = {
+            "mean_ms": statistics.mean(values),
+            "p95_ms": _percentile(values, 95),
+            "min_ms": min(values),
+            "samples": len(values),
+        }
+        if name in memory:
+            summary[name]["peak_kib"] = memory[name] / 1024
+    return summary
+
+
+def benchmark(pythons, runs) -> dict:
+    """
+    Run the cold and warm benchmarks with every interpreter in `pythons`.
+    returns: the json report.
+    """
+    report = {
+        "commit": subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=ROOT,
+        ).stdout.strip(),
+        "created": time.time(),
+        "runs": runs,
+        "results": {},
+    }
+
+    for python in pythons:
+        # every part in its own interpreter, each pays for the imports it does
+        cold = [
+            dict(
+                (name, value)
+                for part in PARTS
+                for name, value in _spawn(python, "cold", 1, part)["samples"][0].items()
+            )
+            for i in range(runs)
+        ]
+        warm = _spawn(python, "warm", runs)
+        django_version = warm["django"]
+        report["results"][django_version] = {
+            "python": python,
+            "cold": _summarize(cold, {}),
+            "warm": _summarize(warm["samples"], warm["memory"]),
+        }
+    return report
+
+
+def print_report(report, baseline=None, threshold=None) -> bool:
+    """
+    Print the report, with the change against `baseline` when given.
+    returns: False when a mean got slower than the baseline by more than `threshold` percent.
+    """
+    ok = True
+    for django_version, modes in report["results"].items():
+        for mode in ("cold", "warm"):
+            print(f"\nDjango {django_version} ({mode}, {report['runs']} runs)")
+            print(f"{'step':32} {'mean ms':>10} {'p95 ms':>10} {'peak KiB':>10} {'change':>9}")
+            for name, stats in modes[mode].items():
+                change = ""
+                old = (baseline or {}).get("results", {}).get(django_version, {}).get(mode, {}).get(name)
+                if old and old["mean_ms"]:
+                    percent = (stats["mean_ms"] - old["mean_ms"]) / old["mean_ms"] * 100
+                    change = f"{percent:+.1f}%"
+                    if threshold is not None and percent > threshold:
+                        change += " !"
+                        ok = False
+                peak = f"{stats['peak_kib']:.0f}" if "peak_kib" in stats else "-"
+                print(
+                    f"{name:32} {stats['mean_ms']:10.2f} {stats['p95_ms']:10.2f} {peak:>10} {change:>9}"
+                )
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--python",
+        action="append",
+        help="interpreter to benchmark with, repeat it for each installed Django version",
+    )
+    parser.add_argument("--output", help="write the json report to this file")
+    parser.add_argument("--compare", help="json report of a previous commit")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="fail when a mean is this many percent slower than --compare",
+    )
+    parser.add_argument("--worker", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    parser.add_argument("--part", choices=list(PARTS), help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.worker:
+        print(json.dumps(_worker(options.worker, options.runs, options.part)))
+        return 0
+
+    report = benchmark(options.python or [sys.executable], options.runs)
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    baseline = None
+    if options.compare:
+        with open(options.compare, "r") as file:
+            baseline = json.load(file)
+
+    return 0 if print_report(report, baseline, options.threshold) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
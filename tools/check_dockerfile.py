@@ -0,0 +1,233 @@
+"""
+Offline check of the container files `djang-setup --docker` generates.
+
+Generates a project for every variant (plain, --server, --profile) and fails when
+    - the Dockerfile breaks a layer caching or runtime rule (see `dockerfile_problems`),
+    - the .dockerignore lets secrets or local environments into the build context,
+    - the build stage's collectstatic fails with the production settings (run here, no docker needed),
+    - hadolint, when it is installed, reports a warning.
+
+usage: python tools/check_dockerfile.py [--keep DIR]
+"""
+import os
+import sys
+import json
+import shlex
+import shutil
+import fnmatch
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cli options of the generated projects, each named `<variant>_site`
+# so that no project shadows a package (uvicorn...) it runs with
+VARIANTS = {
+    "plain": {},
+    "uvicorn": {"server": "uvicorn"},
+    "performance": {"server": "gthread", "profile": "performance"},
+}
+
+# paths the .dockerignore must keep out of the build context, and the ones it must keep in
+IGNORED = [".env.prod", ".env.dev", ".git", "env/bin/python", "db.sqlite3", "app/__pycache__/x.pyc"]
+KEPT = ["requirements.txt", "manage.py", "gunicorn.conf.py"]
+
+
+def instructions(text) -> list:
+    """
+    returns: [(stage index, KEYWORD, arguments)] of a Dockerfile, continuation lines joined.
+    """
+    result = []
+    stage = -1
+    line = ""
+    for raw in text.splitlines():
+        if not line and (not raw.strip() or raw.lstrip().startswith("#")):
+            continue
+        if raw.rstrip().endswith("\\"):
+            line += raw.rstrip()[:-1] + " "
+            continue
+        line += raw
+        keyword, _, arguments = line.strip().partition(" ")
+        keyword = keyword.upper()
+        if keyword == "FROM":
+            stage += 1
+        result.append((stage, keyword, " ".join(arguments.split())))
+        line = ""
+    return result
+
+
+def dockerfile_problems(text, project_name, requirements) -> list:
+    """
+    returns: the rules the Dockerfile breaks, empty when it passes.
+    """
+    problems = []
+    steps = instructions(text)
+    stages = [arguments for stage, keyword, arguments in steps if keyword == "FROM"]
+    if len(stages) < 3:
+        return [f"expected dependencies, build and runtime stages, found {len(stages)} stage(s)"]
+    final = len(stages) - 1
+
+    # layer caching: the dependencies are installed before any source is copied
+    installs = [
+        index
+        for index, (stage, keyword, arguments) in enumerate(steps)
+        if keyword == "RUN" and "pip install" in arguments
+    ]
+    if not installs:
+        problems.append("no RUN installs the requirements")
+    else:
+        for stage, keyword, arguments in steps[: installs[0]]:
+            if keyword in ("COPY", "ADD") and arguments.split()[0] != "requirements.txt":
+                problems.append(f"'{keyword} {arguments}' comes before the dependencies are installed")
+        install = steps[installs[0]][2]
+        if "--mount=type=cache" not in install and "--no-cache-dir" not in install:
+            problems.append("pip install neither uses a cache mount nor --no-cache-dir")
+
+    if not any(keyword == "RUN" and "collectstatic" in arguments for stage, keyword, arguments in steps):
+        problems.append("no stage runs collectstatic")
+
+    # runtime stage
+    runtime = [(keyword, arguments) for stage, keyword, arguments in steps if stage == final]
+    image = stages[final].split()[0]
+    if "-slim" not in image and "alpine" not in image:
+        problems.append(f"the runtime image {image} isn't a slim one")
+    if image.endswith(":latest") or ":" not in image:
+        problems.append(f"the runtime image {image} isn't pinned to a python version")
+    if any(keyword == "COPY" and "--from=" not in arguments for keyword, arguments in runtime):
+        problems.append("the runtime stage copies from the build context instead of the other stages")
+
+    users = [arguments for keyword, arguments in runtime if keyword == "USER"]
+    if not users or users[-1].split(":")[0] in ("root", "0"):
+        problems.append("the runtime stage runs as root")
+
+    environment = {}
+    for keyword, arguments in runtime:
+        if keyword == "ENV":
+            environment.update(part.split("=", 1) for part in shlex.split(arguments) if "=" in part)
+    expected = f"{project_name}.settings.production"
+    if environment.get("SETTING_FILE_PATH") != expected:
+        problems.append(f"the runtime stage doesn't set SETTING_FILE_PATH={expected}")
+
+    commands = [arguments for keyword, arguments in runtime if keyword == "CMD"]
+    if not commands:
+        problems.append("the runtime stage has no CMD")
+    else:
+        try:
+            command = json.loads(commands[-1])
+        except ValueError:
+            problems.append("CMD isn't in exec (JSON array) form, signals won't reach the server")
+        else:
+            installed = {requirement.split("==")[0].lower() for requirement in requirements}
+            if command[0] not in installed:
+                problems.append(f"CMD runs {command[0]}, which requirements.txt doesn't install")
+    return problems
+
+
+def dockerignore_problems(text) -> list:
+    patterns = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+    def ignored(path):
+        return any(
+            fnmatch.fnmatch(path, pattern.rstrip("/").replace("**/", "*"))
+            or fnmatch.fnmatch(path, pattern.rstrip("/") + "/*")
+            for pattern in patterns
+        )
+
+    problems = [f"{path} isn't ignored" for path in IGNORED if not ignored(path)]
+    problems += [f"{path} is ignored" for path in KEPT if ignored(path)]
+    return problems
+
+
+def collectstatic_problems(text, project_root) -> list:
+    """
+    Run the build stage's collectstatic with this python, with the stage's environment.
+    """
+    environment = dict(os.environ)
+    for stage, keyword, arguments in instructions(text):
+        if keyword == "ENV":
+            environment.update(
+                part.split("=", 1)
+                for part in shlex.split(arguments)
+                if "=" in part and not part.startswith("PATH=")
+            )
+        if keyword == "RUN" and "collectstatic" in arguments:
+            words = shlex.split(arguments)
+            while "=" in words[0]:
+                name, value = words.pop(0).split("=", 1)
+                environment[name] = value
+            if words[0] == "python":
+                words[0] = sys.executable
+            result = subprocess.run(
+                words, cwd=project_root, env=environment, capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                return [f"collectstatic failed: {result.stderr.strip().splitlines()[-1]}"]
+            return []
+    return ["no collectstatic to run"]
+
+
+def hadolint_problems(path) -> list:
+    if shutil.which("hadolint") is None:
+        return []
+    result = subprocess.run(
+        ["hadolint", "--failure-threshold", "warning", path], capture_output=True, text=True
+    )
+    return result.stdout.strip().splitlines() if result.returncode != 0 else []
+
+
+def check(directory, name, options) -> list:
+    """
+    Generate the `name` variant in `directory` and check its container files.
+    returns: the problems found.
+    """
+    from cli.cli import Cli
+    from cli.console import quiet
+
+    name = f"{name}_site"
+
+    with quiet():
+        if not Cli(name, ["orders"], directory=directory, docker=True, **options).run_setup():
+            return ["the project couldn't be generated"]
+
+    project_root = os.path.join(directory, name)
+    with open(os.path.join(project_root, "Dockerfile")) as file:
+        dockerfile = file.read()
+    with open(os.path.join(project_root, ".dockerignore")) as file:
+        dockerignore = file.read()
+    with open(os.path.join(project_root, "requirements.txt")) as file:
+        requirements = file.read().split()
+
+    return (
+        dockerfile_problems(dockerfile, name, requirements)
+        + dockerignore_problems(dockerignore)
+        + collectstatic_problems(dockerfile, project_root)
+        + hadolint_problems(os.path.join(project_root, "Dockerfile"))
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keep", default=None, help="Generate the projects in this folder and keep them.")
+    options = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    if shutil.which("hadolint") is None:
+        print("hadolint isn't installed, only the structure rules are checked")
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        directory = options.keep or directory
+        os.makedirs(directory, exist_ok=True)
+        for name, variant in VARIANTS.items():
+            problems = check(directory, name, variant)
+            print(f"{'FAIL' if problems else 'ok  '} {name}: {variant or 'default options'}")
+            for problem in problems:
+                print(f"     {problem}")
+            failed = failed or bool(problems)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Startup-time regression check for the djang-setup CLI.
+
+Runs `djang-setup --version` and `--help` under `python -X importtime` and fails when
+    - rich, black or django get imported on those paths,
+    - the cumulative import time goes over the budget.
+
+usage: python tools/check_startup.py [--budget-ms 150] [--runs 5]
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+# modules that must only be imported once a step needs them
+FORBIDDEN = ("rich", "black", "django")
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(args) -> dict:
+    """
+    Run `python -X importtime -m cli.script *args`.
+    returns: {module: (cumulative microseconds, nesting level)}
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "cli.script", *args],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(2)), len(match.group(3)))
+    return times
+
+
+def total_ms(times) -> float:
+    # only count top level imports, their cumulative time includes the nested ones
+    return sum(cumulative for cumulative, level in times.values() if level == 1) / 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5)
+    options = parser.parse_args()
+
+    failed = False
+    for args in (["--version"], ["--help"]):
+        command = " ".join(["djang-setup", *args])
+
+        runs = [import_times(args) for i in range(options.runs)]
+
+        forbidden = sorted(
+            module for module in runs[0] if module.split(".")[0] in FORBIDDEN
+        )
+        if forbidden:
+            print(f"FAIL {command}: imports {', '.join(forbidden)}")
+            failed = True
+
+        # best of `runs`, the first one also pays for a cold disk cache
+        best = min(total_ms(times) for times in runs)
+        status = "ok  " if best <= options.budget_ms else "FAIL"
+        print(f"{status} {command}: {best:.1f} ms of imports (budget {options.budget_ms:.0f} ms)")
+        failed = failed or best > options.budget_ms
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())